@@ -0,0 +1,195 @@
+# classements.py
+
+import numpy as np
+
+# Colonnes numériques extraites une seule fois des données brutes de chaque pays
+# (nom de colonne -> champ de l'API Skanderbeg)
+CHAMPS_NUMERIQUES = {
+    'pertes_totales': 'total_casualties',
+    'pertes_batailles': 'battleCasualties',
+    'pertes_attrition': 'attritionCasualties',
+    'developpement': 'total_development',
+    'revenu': 'monthly_income',
+    'FL': 'FL',
+}
+
+class Metrique:
+    """
+    Métrique d'un classement : soit une colonne de la table, soit une expression
+    calculée à partir des colonnes (fonction table -> tableau numpy).
+    """
+    def __init__(self, nom, expression=None, entier=False):
+        self.nom = nom
+        self.expression = expression
+        self.entier = entier
+
+    def evaluer(self, table):
+        if self.expression is None:
+            return table[self.nom]
+        return self.expression(table)
+
+class Classement:
+    """
+    Définition déclarative d'un classement.
+    :param titre: str, titre affiché
+    :param tri: str, nom de la métrique servant au tri (décroissant)
+    :param colonnes: list[str], métriques affichées
+    :param filtre: fonction metriques -> masque booléen, ou None
+    :param limite: int, nombre d'entrées affichées (None = toutes)
+    """
+    def __init__(self, titre, tri, colonnes, filtre=None, limite=None):
+        self.titre = titre
+        self.tri = tri
+        self.colonnes = colonnes
+        self.filtre = filtre
+        self.limite = limite
+
+def _ratio(numerateur, denominateur):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominateur > 0, numerateur / denominateur, 0.0)
+
+def _pourcentage(numerateur, denominateur):
+    return _ratio(numerateur, denominateur) * 100
+
+METRIQUES = {
+    'pertes_totales': Metrique('pertes_totales', entier=True),
+    'pertes_batailles': Metrique('pertes_batailles', entier=True),
+    'pertes_attrition': Metrique('pertes_attrition', entier=True),
+    'developpement': Metrique('developpement'),
+    'revenu': Metrique('revenu'),
+    'FL': Metrique('FL'),
+    'pourcentage_attrition': Metrique(
+        'pourcentage_attrition',
+        lambda t: _pourcentage(t['pertes_attrition'], t['pertes_totales'])
+    ),
+    'pertes_par_developpement': Metrique(
+        'pertes_par_developpement',
+        lambda t: _ratio(t['pertes_totales'], t['developpement'])
+    ),
+    'nb_provinces': Metrique('nb_provinces', entier=True),
+    'developpement_par_province': Metrique(
+        'developpement_par_province',
+        lambda t: _ratio(t['developpement'], t['nb_provinces'])
+    ),
+}
+
+COLONNES_PERTES = ['pertes_totales', 'pertes_batailles', 'pertes_attrition', 'pourcentage_attrition']
+
+CLASSEMENT_PERTES_MILITAIRES = Classement(
+    "Pertes Militaires",
+    tri='pertes_totales',
+    colonnes=COLONNES_PERTES,
+    filtre=lambda m: m['pertes_totales'] > 0
+)
+
+# Classements supplémentaires affichés dans l'onglet "Classements"
+CLASSEMENTS = [
+    Classement(
+        "Plus grandes pertes en bataille",
+        tri='pertes_batailles',
+        colonnes=['pertes_batailles', 'pertes_totales'],
+        filtre=lambda m: m['pertes_batailles'] > 0,
+        limite=10
+    ),
+    Classement(
+        "Pire gestion de l'attrition",
+        tri='pourcentage_attrition',
+        colonnes=['pourcentage_attrition', 'pertes_attrition', 'pertes_totales'],
+        filtre=lambda m: m['pertes_totales'] > 0,
+        limite=10
+    ),
+    Classement(
+        "Pertes par point de développement",
+        tri='pertes_par_developpement',
+        colonnes=['pertes_par_developpement', 'pertes_totales', 'developpement'],
+        filtre=lambda m: m['developpement'] > 0,
+        limite=10
+    ),
+    # Nécessite le dump provinceData (voir TYPES_DUMP_ANNEXES)
+    Classement(
+        "Développement moyen par province",
+        tri='developpement_par_province',
+        colonnes=['developpement_par_province', 'nb_provinces', 'developpement'],
+        filtre=lambda m: m['nb_provinces'] > 0,
+        limite=10
+    ),
+]
+
+def _en_nombre(valeur):
+    try:
+        return float(valeur)
+    except (TypeError, ValueError):
+        return 0.0
+
+def construire_table_pays(pays_joues):
+    """
+    Construit une table en colonnes (numpy) à partir des pays joués.
+    :return: dict colonne -> np.ndarray, avec en plus 'tag', 'nom' et 'pseudo_joueur'
+    """
+    tags = list(pays_joues)
+    n = len(tags)
+    table = {
+        'tag': tags,
+        'nom': [pays_joues[tag]['data'].get('countryName', tag) for tag in tags],
+        'pseudo_joueur': [pays_joues[tag]['pseudo_joueur'] for tag in tags],
+    }
+    for colonne, champ in CHAMPS_NUMERIQUES.items():
+        table[colonne] = np.fromiter(
+            (_en_nombre(pays_joues[tag]['data'].get(champ, 0)) for tag in tags),
+            dtype=np.float64,
+            count=n
+        )
+    # Renseigné seulement si le dump provinceData a été fusionné (0 sinon)
+    table['nb_provinces'] = np.fromiter(
+        (pays_joues[tag].get('nb_provinces', 0) for tag in tags),
+        dtype=np.float64,
+        count=n
+    )
+    return table
+
+def sous_table(table, tags):
+    """
+    Lignes de la table dont le tag fait partie de `tags`, dans l'ordre de la table.
+    """
+    indices = np.fromiter((i for i, tag in enumerate(table['tag']) if tag in tags), dtype=np.intp)
+    return {
+        colonne: [valeurs[i] for i in indices] if isinstance(valeurs, list) else valeurs[indices]
+        for colonne, valeurs in table.items()
+    }
+
+def _indices_tries(valeurs, limite):
+    """
+    Indices des plus grandes valeurs, triés par ordre décroissant.
+    Sélection partielle (argpartition) quand seules les premières entrées sont demandées.
+    """
+    n = len(valeurs)
+    if limite is not None and limite < n:
+        indices = np.argpartition(-valeurs, limite - 1)[:limite]
+        return indices[np.argsort(-valeurs[indices], kind='stable')]
+    return np.argsort(-valeurs, kind='stable')
+
+def calculer_classements(table, classements):
+    """
+    Calcule plusieurs classements en une seule passe sur la table :
+    chaque métrique n'est évaluée qu'une fois, de façon vectorisée.
+    :return: list de (classement, list of (tag, dict)) dans l'ordre des définitions
+    """
+    metriques = {nom: metrique.evaluer(table) for nom, metrique in METRIQUES.items()}
+
+    resultats = []
+    for classement in classements:
+        if classement.filtre is not None:
+            indices = np.flatnonzero(classement.filtre(metriques))
+        else:
+            indices = np.arange(len(table['tag']))
+        ordre = indices[_indices_tries(metriques[classement.tri][indices], classement.limite)]
+
+        lignes = []
+        for i in ordre:
+            ligne = {'nom': table['nom'][i], 'pseudo_joueur': table['pseudo_joueur'][i]}
+            for nom in classement.colonnes:
+                valeur = metriques[nom][i]
+                ligne[nom] = int(valeur) if METRIQUES[nom].entier else float(valeur)
+            lignes.append((table['tag'][i], ligne))
+        resultats.append((classement, lignes))
+    return resultats
@@ -5,6 +5,16 @@ from pathlib import Path
 
 TIERS = ['S', 'A', 'B', 'C', 'D']
 
+# Score minimal (sur 100) pour chaque tier avec la stratégie 'seuils' ; en dessous : D
+SEUILS_TIERS = {'S': 80, 'A': 60, 'B': 40, 'C': 20}
+
+# Stratégie 'ruptures_naturelles' : on ajoute des tiers tant que l'inertie résiduelle
+# dépasse cette part de l'inertie totale des scores...
+PART_INERTIE_RUPTURES = 0.05
+# ...et que le nouveau tier réduit l'inertie au moins autant que séparer deux pays
+# distants de cet écart (en points de score sur 100)
+ECART_MIN_RUPTURES = 5
+
 COULEURS_TIERS = {
     'S': '#FFD700',   # Or
     'A': '#C0C0C0',   # Argent
@@ -20,7 +30,45 @@ CLE_API = os.getenv('CLE_API', '')
 BASE_DIR = Path(__file__).resolve().parent
 CHEMIN_DRAPEAUX = BASE_DIR / "flags"
 
+# Table de correspondance province -> région (CSV 'province_id,region'), générée à partir
+# des fichiers du jeu avec generer_regions_provinces.py.
+# Si le fichier est absent, des plages d'IDs approximatives sont utilisées.
+CHEMIN_REGIONS_PROVINCES = BASE_DIR / "regions_provinces.csv"
+
 # Mode local (True) ou production (False)
 # En local (http://localhost:8501), mettez True.
 # En production (http://88.184.216.198:17001), mettez False.
 MODE_LOCAL = True
+
+# Poids par défaut utilisés pour le calcul des scores
+POIDS_DEFAUT = {
+    'developpement': 0.3,
+    'revenu': 0.3,
+    'FL': 0.2,
+    'qualite': 0.2
+}
+
+# Métriques de production (format Prometheus) : port HTTP local (0 = désactivé)
+# et/ou fichier réécrit périodiquement (vide = désactivé)
+PORT_METRIQUES = int(os.getenv('PORT_METRIQUES', '0'))
+FICHIER_METRIQUES = os.getenv('FICHIER_METRIQUES', '')
+INTERVALLE_FICHIER_METRIQUES = 15   # secondes
+INTERVALLE_ESTIMATION_SESSION = 60  # secondes entre deux estimations de la mémoire d'une session
+
+# Préchargement en arrière-plan des sauvegardes surveillées
+PRECHARGEMENT_MAX_WORKERS = int(os.getenv('PRECHARGEMENT_MAX_WORKERS', '2'))
+PRECHARGEMENT_DELAI_INITIAL = 30     # secondes avant la première nouvelle tentative
+PRECHARGEMENT_DELAI_MAX = 900        # plafond du backoff exponentiel
+PRECHARGEMENT_TAILLE_CACHE = 20      # nombre de sauvegardes gardées en mémoire
+PRECHARGEMENT_MAX_SURVEILLES = 10    # nombre maximal de sauvegardes surveillées en même temps
+PRECHARGEMENT_MAX_TENTATIVES = 8     # une sauvegarde est abandonnée après ce nombre d'échecs
+
+# Types de dump Skanderbeg téléchargés en plus de 'countriesData', en parallèle
+# (TYPES_DUMP_ANNEXES="" pour n'en télécharger aucun). Un type en échec est simplement
+# ignoré, et un type sans parseur dans data_processing.PARSEURS_DUMP n'est pas demandé.
+TYPES_DUMP_ANNEXES = [t.strip() for t in os.getenv('TYPES_DUMP_ANNEXES', 'provinceData').split(',') if t.strip()]
+
+# Profilage à la demande d'un rerun (PROFILAGE=1, ou paramètre d'URL ?profil=1)
+PROFILAGE_ACTIF = os.getenv('PROFILAGE', '') == '1'
+DOSSIER_PROFILS = BASE_DIR / "profils"
+PROFILS_MAX = 20                    # nombre de profils conservés sur disque
@@ -3,7 +3,14 @@
 import requests
 import logging
 import urllib.parse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils import get_message
+from metriques import chronometrer, incrementer
+from constants import TIERS, SEUILS_TIERS, PART_INERTIE_RUPTURES, ECART_MIN_RUPTURES
+from regions import region_province
+from classements import construire_table_pays, calculer_classements, CLASSEMENT_PERTES_MILITAIRES, CLASSEMENTS
 
 API_URL = 'https://skanderbeg.pm/api.php'
 
@@ -14,59 +21,63 @@ def obtenir_region_pays(pays_data):
     capital_id = pays_data.get('capital')
     if not capital_id:
         return "Inconnue"
-    
-    # Mapping des IDs de provinces vers les régions
-    # Ces valeurs sont approximatives et peuvent être ajustées
-    if 1 <= capital_id <= 1000:  # Europe de l'Ouest
-        return "Europe"
-    elif 1001 <= capital_id <= 2000:  # Europe de l'Est
-        return "Europe"
-    elif 2001 <= capital_id <= 3000:  # Afrique du Nord et Moyen-Orient
-        return "Afrique"
-    elif 3001 <= capital_id <= 4000:  # Asie
-        return "Asie"
-    elif 4001 <= capital_id <= 5000:  # Amériques
-        return "Amériques"
-    else:
-        return "Inconnue"
+    return region_province(capital_id)
 
-def obtenir_dump_donnees_pays(id_sauvegarde, cle_api):
-    logging.info("🎮 Initialisation du téléchargement du dump des données...")
-    # Message sympa pour le téléchargement (player='???' si vous ne le connaissez pas ici)
-    logging.info(get_message('telechargement').format(player='Visiteur'))
+def _masquer_cle_api(url):
+    """
+    Masque la clé API dans l'URL avant de la journaliser
+    """
+    parsed = urllib.parse.urlsplit(url)
+    qs = urllib.parse.parse_qs(parsed.query)
+    if 'key' in qs:
+        qs['key'] = ['***HIDDEN***']
+    new_query = urllib.parse.urlencode(qs, doseq=True)
+    return urllib.parse.urlunsplit((parsed.scheme, parsed.netloc, parsed.path, new_query, ''))
 
+def _telecharger_dump(id_sauvegarde, cle_api, type_dump, session=None):
+    """
+    Exécute la requête HTTP et décode le JSON, sans journaliser : peut tourner
+    dans un thread sans contexte Streamlit.
+    :return: (response, JSON décodé ou None si la réponse n'est pas du JSON)
+    """
     params = {
         'key': cle_api,
         'scope': 'getSaveDataDump',
         'save': id_sauvegarde,
-        'type': 'countriesData',
+        'type': type_dump,
         'format': 'json'
     }
-    response = requests.get(API_URL, params=params)
-    
-    # Masquer la clé API dans l'URL
-    url = response.url
-    parsed = urllib.parse.urlsplit(url)
-    qs = urllib.parse.parse_qs(parsed.query)
-    if 'key' in qs:
-        qs['key'] = ['***HIDDEN***']
-    new_query = urllib.parse.urlencode(qs, doseq=True)
-    new_url = urllib.parse.urlunsplit((parsed.scheme, parsed.netloc, parsed.path, new_query, ''))
-    
+    try:
+        with chronometrer('skanderbeg_requete_duree_secondes', type=type_dump):
+            response = (session or requests).get(API_URL, params=params)
+    except requests.RequestException:
+        incrementer('skanderbeg_requetes_total', type=type_dump, statut='erreur_reseau')
+        raise
+    incrementer('skanderbeg_requetes_total', type=type_dump, statut=str(response.status_code))
     if response.status_code != 200:
-        logging.error(f"❌ Erreur HTTP {response.status_code} lors de la récupération des données.")
-        logging.error(f"Contenu de la réponse : {response.text}")
-        return None
+        return response, None
     try:
-        dump_donnees = response.json()
-        if 'error' in dump_donnees:
-            logging.error(f"❌ Erreur de l'API : {dump_donnees['error']}")
-            return None
-        return dump_donnees
+        return response, response.json()
     except ValueError:
-        logging.error("❌ La réponse de l'API n'est pas au format JSON.")
+        return response, None
+
+def _verifier_dump(response, dump_donnees, type_dump):
+    """
+    Journalise les erreurs éventuelles d'une réponse et retourne le dump valide, ou None.
+    """
+    logging.debug(f"🔎 URL demandée : {_masquer_cle_api(response.url)}")
+    if response.status_code != 200:
+        logging.error(f"❌ Erreur HTTP {response.status_code} lors de la récupération des données ({type_dump}).")
+        logging.error(f"Contenu de la réponse : {response.text}")
+        return None
+    if dump_donnees is None:
+        logging.error(f"❌ La réponse de l'API n'est pas au format JSON ({type_dump}).")
         logging.error(f"Contenu de la réponse : {response.text}")
         return None
+    if isinstance(dump_donnees, dict) and 'error' in dump_donnees:
+        logging.error(f"❌ Erreur de l'API ({type_dump}) : {dump_donnees['error']}")
+        return None
+    return dump_donnees
 
 def extraire_pays_joues(dump_donnees, regions_filtrees=None):
     """
@@ -111,6 +122,103 @@ def extraire_pays_joues(dump_donnees, regions_filtrees=None):
 
     return pays_joues, dict_pays
 
+def extraire_provinces(dump_donnees):
+    """
+    Extrait le propriétaire de chaque province du dump provinceData
+    :return: dict province_id -> tag du propriétaire, ou None
+    """
+    donnees_provinces = dump_donnees.get('provinces') or dump_donnees
+    if isinstance(donnees_provinces, dict):
+        dict_provinces = donnees_provinces
+    elif isinstance(donnees_provinces, list):
+        dict_provinces = {p.get('id'): p for p in donnees_provinces if isinstance(p, dict)}
+    else:
+        logging.error("❌ Format inconnu pour les données de provinces.")
+        return None
+
+    proprietaires = {}
+    for province_id, province in dict_provinces.items():
+        if isinstance(province, dict) and province.get('owner'):
+            proprietaires[province_id] = province['owner']
+
+    if not proprietaires:
+        logging.error("❌ Aucune province possédée trouvée dans le dump.")
+        return None
+    return proprietaires
+
+# Parseurs appliqués à chaque type de dump dès sa réception.
+# Seuls ces types sont téléchargés : les autres sont ignorés avant toute requête.
+PARSEURS_DUMP = {
+    'countriesData': extraire_pays_joues,
+    'provinceData': extraire_provinces,
+}
+
+def obtenir_dumps_multiples(id_sauvegarde, cle_api, types_dump, max_workers=None):
+    """
+    Télécharge plusieurs types de dump pour une même sauvegarde en parallèle.
+    Seules les requêtes tournent dans les threads : chaque réponse est vérifiée
+    et parsée dans le thread appelant dès son arrivée, pour que les messages
+    restent affichés dans l'interface.
+    :return: dict type -> résultat parsé (None si le téléchargement ou le parsing a échoué)
+    """
+    logging.info("🎮 Initialisation du téléchargement des dumps de données...")
+    logging.info(get_message('telechargement').format(player='Visiteur'))
+
+    types_dump = list(dict.fromkeys(types_dump))
+    ignores = [type_dump for type_dump in types_dump if type_dump not in PARSEURS_DUMP]
+    if ignores:
+        logging.warning(f"Types de dump sans parseur ignorés : {', '.join(ignores)}")
+        types_dump = [type_dump for type_dump in types_dump if type_dump in PARSEURS_DUMP]
+    # Une session HTTP par thread : requests.Session n'est pas garantie thread-safe
+    local = threading.local()
+    sessions = []
+    verrou_sessions = threading.Lock()
+
+    def telecharger(type_dump):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+            with verrou_sessions:
+                sessions.append(session)
+        return _telecharger_dump(id_sauvegarde, cle_api, type_dump, session)
+
+    resultats = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or len(types_dump) or 1) as executor:
+            futures = {executor.submit(telecharger, type_dump): type_dump for type_dump in types_dump}
+            for future in as_completed(futures):
+                type_dump = futures[future]
+                try:
+                    dump_donnees = _verifier_dump(*future.result(), type_dump)
+                    if dump_donnees is not None:
+                        dump_donnees = PARSEURS_DUMP[type_dump](dump_donnees)
+                    resultats[type_dump] = dump_donnees
+                except Exception as e:
+                    logging.error(f"❌ Erreur lors de la récupération de {type_dump} : {e}")
+                    resultats[type_dump] = None
+    finally:
+        for session in sessions:
+            session.close()
+    return resultats
+
+def fusionner_dumps(dumps):
+    """
+    Fusionne les dumps parsés en un seul résultat d'ingestion : les pays joués,
+    enrichis des données annexes reçues (nombre de provinces possédées).
+    :return: (pays_joues, dict_pays), ou None si les données de pays manquent
+    """
+    result = dumps.get('countriesData')
+    if not result:
+        return None
+    pays_joues, dict_pays = result
+
+    proprietaires = dumps.get('provinceData')
+    if proprietaires:
+        nb_provinces = Counter(proprietaires.values())
+        for tag, joueur_info in pays_joues.items():
+            joueur_info['nb_provinces'] = nb_provinces.get(tag, 0)
+    return pays_joues, dict_pays
+
 def accumuler_statistiques_pays(pays_joues, dict_pays):
     """
     Calcule les statistiques finales en tenant compte des pays et de leurs vassaux.
@@ -171,9 +279,115 @@ def accumuler_statistiques_pays(pays_joues, dict_pays):
 
     return stats_pays
 
-def calculer_scores_et_tiers(stats_pays, poids):
+def _tiers_percentiles(scores):
+    """
+    Répartit les pays triés en cinq tranches de 20 %.
+    """
+    total = len(scores)
+    return [idx * len(TIERS) // total for idx in range(total)]
+
+def _tiers_seuils(scores):
+    """
+    Attribue les tiers selon des seuils absolus de score (SEUILS_TIERS).
+    """
+    indices = []
+    for score in scores:
+        for idx, tier in enumerate(TIERS[:-1]):
+            if score >= SEUILS_TIERS[tier]:
+                indices.append(idx)
+                break
+        else:
+            indices.append(len(TIERS) - 1)
+    return indices
+
+def _tiers_ruptures_naturelles(scores):
+    """
+    Ruptures naturelles : k-means 1D optimal sur les scores triés (programmation
+    dynamique avec optimisation diviser-pour-régner, O(k·n·log n)).
+    Les scores égaux forment un seul point pondéré et ne sont jamais séparés.
+    Le nombre de groupes est le plus petit k (au plus len(TIERS)) dont l'inertie
+    résiduelle ne dépasse pas PART_INERTIE_RUPTURES de l'inertie totale ; un groupe
+    n'est ajouté que s'il réduit l'inertie d'au moins ECART_MIN_RUPTURES² / 2, le gain
+    obtenu en séparant deux pays isolés distants de ECART_MIN_RUPTURES points. Des
+    scores serrés restent donc dans le même tier.
+    """
+    # Regrouper les scores égaux (ordre croissant) : valeur -> effectif
+    valeurs, effectifs = [], []
+    for v in reversed(scores):
+        if valeurs and v == valeurs[-1]:
+            effectifs[-1] += 1
+        else:
+            valeurs.append(v)
+            effectifs.append(1)
+    m = len(valeurs)
+    k_max = min(len(TIERS), m)
+
+    somme, somme_carres, effectif = [0.0], [0.0], [0]
+    for v, e in zip(valeurs, effectifs):
+        somme.append(somme[-1] + e * v)
+        somme_carres.append(somme_carres[-1] + e * v * v)
+        effectif.append(effectif[-1] + e)
+
+    def cout(debut, fin):
+        # Somme pondérée des écarts au carré du segment [debut, fin]
+        s = somme[fin + 1] - somme[debut]
+        return somme_carres[fin + 1] - somme_carres[debut] - s * s / (effectif[fin + 1] - effectif[debut])
+
+    precedent = [cout(0, i) for i in range(m)]
+    inertie_totale = precedent[-1]
+    gain_min = ECART_MIN_RUPTURES ** 2 / 2
+    debuts = [None] * k_max  # debuts[c][i] : début du dernier segment pour c+1 groupes sur [0, i]
+    k = 1
+    for c in range(1, k_max):
+        if precedent[-1] <= PART_INERTIE_RUPTURES * inertie_totale:
+            break
+        courant = [float('inf')] * m
+        debut = [0] * m
+
+        def calculer(lo, hi, opt_lo, opt_hi):
+            if lo > hi:
+                return
+            mid = (lo + hi) // 2
+            meilleur, meilleur_j = float('inf'), opt_lo
+            for j in range(max(opt_lo, c), min(mid, opt_hi) + 1):
+                valeur = precedent[j - 1] + cout(j, mid)
+                if valeur < meilleur:
+                    meilleur, meilleur_j = valeur, j
+            courant[mid], debut[mid] = meilleur, meilleur_j
+            calculer(lo, mid - 1, opt_lo, meilleur_j)
+            calculer(mid + 1, hi, meilleur_j, opt_hi)
+
+        calculer(c, m - 1, c, m - 1)
+        if precedent[-1] - courant[-1] < gain_min:
+            break
+        precedent, debuts[c] = courant, debut
+        k = c + 1
+
+    groupes = [0] * m
+    fin = m - 1
+    for c in range(k - 1, -1, -1):
+        j = debuts[c][fin] if c > 0 else 0
+        for i in range(j, fin + 1):
+            groupes[i] = c
+        fin = j - 1
+
+    # Le groupe le plus élevé correspond au tier S ; revenir à l'ordre décroissant des pays
+    indices = []
+    for g, e in zip(reversed(groupes), reversed(effectifs)):
+        indices.extend([k - 1 - g] * e)
+    return indices
+
+# Stratégies de répartition : scores triés (décroissants) -> indice de tier dans TIERS
+STRATEGIES_TIERS = {
+    'percentiles': _tiers_percentiles,
+    'seuils': _tiers_seuils,
+    'ruptures_naturelles': _tiers_ruptures_naturelles,
+}
+
+def calculer_scores_et_tiers(stats_pays, poids, strategie='percentiles'):
     """
     Calcule les scores pondérés et attribue les tiers aux pays.
+    :param strategie: str, clé de STRATEGIES_TIERS
     """
     # Calculer d'abord les valeurs maximales en excluant les pays inactifs
     pays_actifs = {tag: pays for tag, pays in stats_pays.items() 
@@ -219,59 +433,24 @@ def calculer_scores_et_tiers(stats_pays, poids):
     if total_pays == 0:
         return {}
 
+    indices_tiers = STRATEGIES_TIERS[strategie]([donnees['score'] for _, donnees in pays_tries])
+
     tiers = {}
-    for idx, (tag, donnees) in enumerate(pays_tries):
-        percentile = idx / total_pays
-        if percentile < 0.2:
-            tier = 'S'
-        elif percentile < 0.4:
-            tier = 'A'
-        elif percentile < 0.6:
-            tier = 'B'
-        elif percentile < 0.8:
-            tier = 'C'
-        else:
-            tier = 'D'
+    for (tag, donnees), idx_tier in zip(pays_tries, indices_tiers):
+        tier = TIERS[idx_tier]
         if tier not in tiers:
             tiers[tier] = []
         tiers[tier].append((tag, donnees))
     return tiers
 
-def calculer_pertes_militaires(pays_joues, dict_pays):
+def calculer_classements_pays(pays_joues):
     """
-    Calcule les pertes militaires totales pour chaque pays.
-    Ne garde que les pays ayant des pertes.
+    Calcule en une seule passe les pertes militaires et les classements supplémentaires.
+    La table est aussi retournée pour recalculer les classements sur une sélection de régions.
+    :return: (table, pertes_triees, list of (Classement, list of (tag, dict)))
     """
-    pertes_pays = {}
-    
-    for tag, joueur_info in pays_joues.items():
-        pays = joueur_info['data']
-        pseudo_joueur = joueur_info['pseudo_joueur']
-        
-        # Utiliser les noms exacts des variables de l'API Skanderbeg
-        pertes_totales = int(pays.get('total_casualties', 0))
-        pertes_batailles = int(pays.get('battleCasualties', 0))
-        pertes_attrition = int(pays.get('attritionCasualties', 0))
-        
-        # Ne garder que les pays ayant des pertes
-        if pertes_totales > 0:
-            # Calculer le pourcentage d'attrition
-            pourcentage_attrition = (pertes_attrition / pertes_totales * 100)
-            
-            pertes_pays[tag] = {
-                'nom': pays.get('countryName', tag),
-                'pseudo_joueur': pseudo_joueur,
-                'pertes_totales': pertes_totales,
-                'pertes_batailles': pertes_batailles,
-                'pertes_attrition': pertes_attrition,
-                'pourcentage_attrition': pourcentage_attrition
-            }
-    
-    # Trier les pays par pertes totales
-    pertes_triees = sorted(
-        pertes_pays.items(),
-        key=lambda x: x[1]['pertes_totales'],
-        reverse=True
+    table = construire_table_pays(pays_joues)
+    [(_, pertes_triees), *classements] = calculer_classements(
+        table, [CLASSEMENT_PERTES_MILITAIRES] + CLASSEMENTS
     )
-    
-    return pertes_triees
+    return table, pertes_triees, classements
@@ -0,0 +1,161 @@
+# export_donnees.py
+
+import csv
+import io
+import json
+from classements import COLONNES_PERTES
+
+# pyarrow est optionnel : sans lui, les exports Parquet/Arrow sont désactivés
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Colonnes exportées : (clé, en-tête CSV, type Arrow)
+COLONNES_EXPORT = [
+    ('tag', None, 'string'),
+    ('type', 'Type', 'string'),
+    ('pays', 'Pays', 'string'),
+    ('joueur', 'Joueur', 'string'),
+    ('tier', 'Tier', 'string'),
+    ('score', 'Score', 'float64'),
+    ('developpement', 'Dev', 'float64'),
+    ('revenu', 'Revenu', 'float64'),
+    ('FL', 'FL', 'float64'),
+    ('qualite', 'Qualité', 'float64'),
+    ('pertes_totales', 'Pertes Totales', 'int64'),
+    ('pertes_batailles', 'Pertes en Bataille', 'int64'),
+    ('pertes_attrition', 'Pertes par Attrition', 'int64'),
+    ('pourcentage_attrition', '% Attrition', 'float64'),
+]
+
+# Format CSV historique de chaque colonne numérique
+FORMATS_CSV = {
+    'score': '{:.2f}',
+    'developpement': '{:.1f}',
+    'revenu': '{:.2f}',
+    'FL': '{:.1f}',
+    'qualite': '{:.2f}',
+    'pourcentage_attrition': '{:.1f}',
+}
+
+PERTES_VIDES = {'pertes_totales': 0, 'pertes_batailles': 0, 'pertes_attrition': 0, 'pourcentage_attrition': 0}
+
+COLONNES_STATS = ['developpement', 'revenu', 'FL', 'qualite']
+
+def construire_colonnes_export(tiers, pertes_militaires):
+    """
+    Construit les colonnes d'export à partir des tiers et des pertes : les pays de la
+    tierlist, puis ceux qui n'ont que des pertes militaires.
+    Seule source de la jointure tiers/pertes, utilisée par tous les formats d'export.
+    :param tiers: dict tier -> list of (tag, stats)
+    :param pertes_militaires: list of (tag, dict) triée
+    :return: dict clé -> list, une entrée par colonne de COLONNES_EXPORT
+    """
+    pertes_dict = dict(pertes_militaires)
+    classes = [(tag, donnees, tier) for tier, pays_list in tiers.items() for tag, donnees in pays_list]
+    tags_classes = {tag for tag, _, _ in classes}
+    hors_tiers = [(tag, pertes) for tag, pertes in pertes_militaires if tag not in tags_classes]
+    pertes_classes = [pertes_dict.get(tag, PERTES_VIDES) for tag, _, _ in classes]
+    n_hors_tiers = len(hors_tiers)
+
+    colonnes = {
+        'tag': [tag for tag, _, _ in classes] + [tag for tag, _ in hors_tiers],
+        'type': ['Pays'] * (len(classes) + n_hors_tiers),
+        'pays': [donnees.get('nom', tag) for tag, donnees, _ in classes]
+                + [pertes.get('nom', tag) for tag, pertes in hors_tiers],
+        'joueur': [donnees.get('pseudo_joueur', 'N/A') for _, donnees, _ in classes] + ['N/A'] * n_hors_tiers,
+        'tier': [tier for _, _, tier in classes] + ['N/A'] * n_hors_tiers,
+        'score': [float(donnees.get('score', 0)) for _, donnees, _ in classes] + [0.0] * n_hors_tiers,
+    }
+    for cle in COLONNES_STATS:
+        colonnes[cle] = [float(donnees.get(cle, 0)) for _, donnees, _ in classes] + [0.0] * n_hors_tiers
+    for cle in COLONNES_PERTES:
+        conversion = float if cle == 'pourcentage_attrition' else int
+        colonnes[cle] = ([conversion(pertes[cle]) for pertes in pertes_classes]
+                         + [conversion(pertes[cle]) for _, pertes in hors_tiers])
+    return colonnes
+
+def iterer_lignes_export(tiers, pertes_militaires):
+    """
+    Produit une ligne typée (dict) par pays, lue depuis les colonnes d'export.
+    """
+    colonnes = construire_colonnes_export(tiers, pertes_militaires)
+    cles = [cle for cle, _, _ in COLONNES_EXPORT]
+    for valeurs in zip(*(colonnes[cle] for cle in cles)):
+        yield dict(zip(cles, valeurs))
+
+class _TamponLigne:
+    """
+    Pseudo-fichier qui renvoie la ligne écrite au lieu de la stocker.
+    """
+    def write(self, ligne):
+        return ligne
+
+def generer_csv(tiers, pertes_militaires):
+    """
+    Génère l'export CSV ligne par ligne (en-têtes français, format historique).
+    :return: générateur de str
+    """
+    colonnes = [(cle, entete) for cle, entete, _ in COLONNES_EXPORT if entete is not None]
+    writer = csv.writer(_TamponLigne())
+    yield writer.writerow([entete for _, entete in colonnes])
+    for ligne in iterer_lignes_export(tiers, pertes_militaires):
+        yield writer.writerow([
+            FORMATS_CSV[cle].format(ligne[cle]) if cle in FORMATS_CSV else ligne[cle]
+            for cle, _ in colonnes
+        ])
+
+def exporter_donnees_csv(tiers, pertes_militaires):
+    """
+    Prépare les données combinées de la tierlist et des pertes militaires pour l'export CSV
+    """
+    return ''.join(generer_csv(tiers, pertes_militaires))
+
+def generer_jsonl(tiers, pertes_militaires):
+    """
+    Génère l'export JSON Lines : un objet JSON typé par pays.
+    :return: générateur de str
+    """
+    for ligne in iterer_lignes_export(tiers, pertes_militaires):
+        yield json.dumps(ligne, ensure_ascii=False) + '\n'
+
+def exporter_donnees_jsonl(tiers, pertes_militaires):
+    return ''.join(generer_jsonl(tiers, pertes_militaires))
+
+def arrow_disponible():
+    return pa is not None
+
+def construire_table_arrow(tiers, pertes_militaires):
+    """
+    Construit une table Arrow, colonne par colonne.
+    """
+    colonnes = construire_colonnes_export(tiers, pertes_militaires)
+    return pa.table({
+        cle: pa.array(colonnes[cle], type=getattr(pa, type_arrow)())
+        for cle, _, type_arrow in COLONNES_EXPORT
+    })
+
+def exporter_donnees_parquet(tiers, pertes_militaires):
+    """
+    Export Parquet (bytes), ou None si pyarrow n'est pas installé.
+    """
+    if pa is None:
+        return None
+    buf = io.BytesIO()
+    pq.write_table(construire_table_arrow(tiers, pertes_militaires), buf)
+    return buf.getvalue()
+
+def exporter_donnees_arrow(tiers, pertes_militaires):
+    """
+    Export au format fichier Arrow IPC (bytes), ou None si pyarrow n'est pas installé.
+    """
+    if pa is None:
+        return None
+    table = construire_table_arrow(tiers, pertes_militaires)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
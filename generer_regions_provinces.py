@@ -0,0 +1,106 @@
+# generer_regions_provinces.py
+
+import re
+import csv
+import argparse
+from pathlib import Path
+from constants import CHEMIN_REGIONS_PROVINCES
+
+def lire_script_paradox(chemin):
+    """
+    Lit un fichier de script Paradox (clé = valeur, blocs entre accolades).
+    :return: list de (clé, valeur) ; clé None pour une valeur nue, valeur = str ou list
+    """
+    texte = Path(chemin).read_text(encoding='utf-8-sig', errors='replace')
+    texte = re.sub(r'#[^\n]*', '', texte)
+    jetons = re.findall(r'[{}=]|"[^"]*"|[^\s{}=]+', texte)
+
+    def bloc(i):
+        elements = []
+        while i < len(jetons) and jetons[i] != '}':
+            if i + 1 < len(jetons) and jetons[i + 1] == '=':
+                cle = jetons[i]
+                if i + 2 < len(jetons) and jetons[i + 2] == '{':
+                    valeur, i = bloc(i + 3)
+                    i += 1
+                else:
+                    valeur = jetons[i + 2] if i + 2 < len(jetons) else ''
+                    i += 3
+                elements.append((cle, valeur))
+            elif jetons[i] == '{':
+                valeur, i = bloc(i + 1)
+                elements.append((None, valeur))
+                i += 1
+            else:
+                elements.append((None, jetons[i]))
+                i += 1
+        return elements, i
+
+    return bloc(0)[0]
+
+def _valeurs_nues(elements):
+    return [valeur for cle, valeur in elements if cle is None and isinstance(valeur, str)]
+
+def nom_lisible(nom):
+    """
+    'western_europe_superregion' -> 'Western Europe'
+    """
+    nom = re.sub(r'_(super)?region$', '', nom)
+    return nom.replace('_', ' ').title()
+
+def generer_correspondances(dossier_jeu, niveau='region'):
+    """
+    Construit la table province -> région à partir de map/area.txt et map/region.txt
+    (et map/superregion.txt pour le niveau 'superregion').
+    :return: list of (province_id, nom de région) triée par province
+    """
+    dossier_carte = Path(dossier_jeu) / 'map'
+
+    provinces_zone = {}
+    for zone, contenu in lire_script_paradox(dossier_carte / 'area.txt'):
+        if isinstance(contenu, list):
+            provinces_zone[zone] = [int(v) for v in _valeurs_nues(contenu) if v.isdigit()]
+
+    zones_region = {}
+    for region, contenu in lire_script_paradox(dossier_carte / 'region.txt'):
+        if isinstance(contenu, list):
+            zones_region[region] = [zone for cle, zones in contenu if cle == 'areas' and isinstance(zones, list)
+                                    for zone in _valeurs_nues(zones)]
+
+    if niveau == 'superregion':
+        groupes = {
+            superregion: [zone for region in _valeurs_nues(contenu) for zone in zones_region.get(region, [])]
+            for superregion, contenu in lire_script_paradox(dossier_carte / 'superregion.txt')
+            if isinstance(contenu, list)
+        }
+    else:
+        groupes = zones_region
+
+    correspondances = {}
+    for groupe, zones in groupes.items():
+        for zone in zones:
+            for province_id in provinces_zone.get(zone, []):
+                correspondances[province_id] = nom_lisible(groupe)
+    return sorted(correspondances.items())
+
+def ecrire_csv(correspondances, chemin):
+    with open(chemin, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['province_id', 'region'])
+        writer.writerows(correspondances)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Génère la table province -> région à partir des fichiers d'EU4"
+    )
+    parser.add_argument('dossier_jeu', help="Dossier d'installation d'EU4 (contenant map/)")
+    parser.add_argument('--niveau', choices=['region', 'superregion'], default='superregion',
+                        help="Granularité des régions (défaut : superregion)")
+    parser.add_argument('--sortie', default=str(CHEMIN_REGIONS_PROVINCES),
+                        help="Fichier CSV à écrire")
+    args = parser.parse_args()
+
+    correspondances = generer_correspondances(args.dossier_jeu, args.niveau)
+    ecrire_csv(correspondances, args.sortie)
+    print(f"{len(correspondances)} provinces écrites dans {args.sortie} "
+          f"({len({r for _, r in correspondances})} régions)")
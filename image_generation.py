@@ -2,62 +2,189 @@
 
 from PIL import Image, ImageDraw, ImageFont
 import os
+import struct
+import zlib
+import time
 import logging
+from functools import lru_cache
 from constants import TIERS, COULEURS_TIERS
+from metriques import chronometrer, observer, enregistrer_collecteur
 
-def creer_image_tierlist(tiers, chemin_drapeaux):
+LARGEUR_IMAGE = 1200
+MARGE_GAUCHE = 120        # espace réservé au libellé du tier
+LARGEUR_CARTE = 182
+HAUTEUR_CARTE = 190       # drapeau + texte d'un pays
+HAUTEUR_MIN_TIER = 220
+DECALAGE_PREMIERE_LIGNE = 30
+TAILLE_DRAPEAU = 48       # Définir une taille constante pour le drapeau
+DECALAGE_TEXTE = 55       # écart vertical entre le haut du drapeau et le texte
+HAUTEUR_MAX_BANDE = 2000  # hauteur maximale d'une bande rendue en une fois
+
+class LigneTierlist:
+    """
+    Bande horizontale de la tierlist : le début d'un tier ou une ligne de cartes supplémentaire.
     """
-    Crée une image représentant la tierlist.
-    :param tiers: dict tier -> list of (tag, stats)
-    :param chemin_drapeaux: str, chemin vers le dossier des drapeaux
-    :return: PIL.Image
+    def __init__(self, tier, y0, hauteur, cartes, premiere):
+        self.tier = tier
+        self.y0 = y0
+        self.hauteur = hauteur
+        self.cartes = cartes        # list of (tag, donnees, x)
+        self.premiere = premiere    # True si la ligne porte le libellé du tier
+
+    @property
+    def y_cartes(self):
+        return self.y0 + (DECALAGE_PREMIERE_LIGNE if self.premiere else 0)
+
+def calculer_disposition(tiers, largeur=LARGEUR_IMAGE):
     """
-    largeur = 1200
-    hauteur_par_tier = 220
-    hauteur_image = hauteur_par_tier * len(TIERS)
-    img = Image.new('RGB', (largeur, hauteur_image), color='white')
-    draw = ImageDraw.Draw(img)
+    Calcule la disposition de la tierlist : les cartes sont réparties sur autant de
+    lignes que nécessaire et chaque tier prend la hauteur de son contenu.
+    :return: (list of LigneTierlist, hauteur totale)
+    """
+    cartes_par_ligne = max(1, (largeur - MARGE_GAUCHE) // LARGEUR_CARTE)
+    lignes = []
+    y = 0
+    for tier in TIERS:
+        pays_tier = tiers.get(tier, [])
+        debut_tier = y
+        morceaux = [pays_tier[i:i + cartes_par_ligne]
+                    for i in range(0, len(pays_tier), cartes_par_ligne)] or [[]]
+        for num, morceau in enumerate(morceaux):
+            premiere = num == 0
+            hauteur = HAUTEUR_CARTE + (DECALAGE_PREMIERE_LIGNE if premiere else 0)
+            cartes = [(tag, donnees, MARGE_GAUCHE + i * LARGEUR_CARTE)
+                      for i, (tag, donnees) in enumerate(morceau)]
+            lignes.append(LigneTierlist(tier, y, hauteur, cartes, premiere))
+            y += hauteur
+        # Garantir la hauteur minimale historique d'un tier
+        if y - debut_tier < HAUTEUR_MIN_TIER:
+            lignes[-1].hauteur += HAUTEUR_MIN_TIER - (y - debut_tier)
+            y = debut_tier + HAUTEUR_MIN_TIER
+    return lignes, y
+
+def texte_carte(tag, donnees):
+    tag_et_pseudo = f"{tag} ({donnees.get('pseudo_joueur', 'N/A')})"
+    return (
+        f"{tag_et_pseudo}\n"
+        f"FL: {donnees['FL']:.0f}\n"
+        f"Dev: {donnees['developpement']:.0f}\n"
+        f"Revenu: {donnees['revenu']:.2f}\n"
+        f"Qualité: {donnees['qualite']:.2f}\n"
+        f"Vassaux: {donnees['nb_vassaux']}\n"
+        f"Score: {donnees['score']:.2f}"
+    )
+
+def _charger_polices():
     try:
-        font = ImageFont.truetype("arial.ttf", 20)
-        font_petit = ImageFont.truetype("arial.ttf", 14)
+        return ImageFont.truetype("arial.ttf", 20), ImageFont.truetype("arial.ttf", 14)
     except IOError:
-        font = ImageFont.load_default()
-        font_petit = ImageFont.load_default()
-    
-    taille_drapeau = 48  # Définir une taille constante pour le drapeau
-    
-    for idx, tier in enumerate(TIERS):
-        y0 = idx * hauteur_par_tier
-        draw.rectangle([0, y0, largeur, y0 + hauteur_par_tier], fill=COULEURS_TIERS[tier])
-        draw.text((10, y0 + 10), f"Tier {tier}", fill='black', font=font)
-        if tier in tiers:
-            x = 120
-            for tag, donnees in tiers[tier]:
-                image_drapeau = obtenir_image_drapeau_pays(tag, chemin_drapeaux)
-                if image_drapeau:
-                    image_drapeau = image_drapeau.resize((taille_drapeau, taille_drapeau))
-                    img.paste(image_drapeau, (x, y0 + 30))
-                else:
-                    # Dessiner un rectangle gris pour le drapeau manquant
-                    draw.rectangle(
-                        [x, y0 + 30, x + taille_drapeau, y0 + 30 + taille_drapeau],
-                        fill='#CCCCCC',
-                        outline='#999999'
-                    )
-                
-                tag_et_pseudo = f"{tag} ({donnees.get('pseudo_joueur', 'N/A')})"
-                texte = (
-                    f"{tag_et_pseudo}\n"
-                    f"FL: {donnees['FL']:.0f}\n"
-                    f"Dev: {donnees['developpement']:.0f}\n"
-                    f"Revenu: {donnees['revenu']:.2f}\n"
-                    f"Qualité: {donnees['qualite']:.2f}\n"
-                    f"Vassaux: {donnees['nb_vassaux']}\n"
-                    f"Score: {donnees['score']:.2f}"
-                )
-                draw.multiline_text((x, y0 + 85), texte, fill='black', font=font_petit)
-                x += 182
-    return img
+        return ImageFont.load_default(), ImageFont.load_default()
+
+def generer_bandes_tierlist(tiers, chemin_drapeaux, largeur=LARGEUR_IMAGE, hauteur_max_bande=HAUTEUR_MAX_BANDE):
+    """
+    Rend la tierlist bande par bande, pour borner la mémoire utilisée quelle que soit
+    la taille de la liste.
+    :return: (hauteur totale, générateur de (y0, PIL.Image))
+    """
+    lignes, hauteur_totale = calculer_disposition(tiers, largeur)
+
+    # Regrouper les lignes en bandes de hauteur bornée
+    bandes = []
+    hauteur_bande = 0
+    for ligne in lignes:
+        if bandes and hauteur_bande + ligne.hauteur <= hauteur_max_bande:
+            bandes[-1].append(ligne)
+            hauteur_bande += ligne.hauteur
+        else:
+            bandes.append([ligne])
+            hauteur_bande = ligne.hauteur
+
+    def generer():
+        font, font_petit = _charger_polices()
+        for bande in bandes:
+            y_bande = bande[0].y0
+            hauteur_bande = sum(l.hauteur for l in bande)
+            img = Image.new('RGB', (largeur, hauteur_bande), color='white')
+            draw = ImageDraw.Draw(img)
+            for ligne in bande:
+                y0 = ligne.y0 - y_bande
+                draw.rectangle([0, y0, largeur, y0 + ligne.hauteur], fill=COULEURS_TIERS[ligne.tier])
+                if ligne.premiere:
+                    draw.text((10, y0 + 10), f"Tier {ligne.tier}", fill='black', font=font)
+                y_cartes = ligne.y_cartes - y_bande
+                for tag, donnees, x in ligne.cartes:
+                    image_drapeau = obtenir_drapeau_redimensionne(tag, chemin_drapeaux, TAILLE_DRAPEAU)
+                    if image_drapeau:
+                        img.paste(image_drapeau, (x, y_cartes))
+                    else:
+                        # Dessiner un rectangle gris pour le drapeau manquant
+                        draw.rectangle(
+                            [x, y_cartes, x + TAILLE_DRAPEAU, y_cartes + TAILLE_DRAPEAU],
+                            fill='#CCCCCC',
+                            outline='#999999'
+                        )
+                    draw.multiline_text((x, y_cartes + DECALAGE_TEXTE), texte_carte(tag, donnees),
+                                        fill='black', font=font_petit)
+            yield y_bande, img
+
+    return hauteur_totale, generer()
+
+def _chunk_png(type_chunk, donnees):
+    return (struct.pack('>I', len(donnees)) + type_chunk + donnees
+            + struct.pack('>I', zlib.crc32(type_chunk + donnees) & 0xffffffff))
+
+def generer_png_tierlist(tiers, chemin_drapeaux):
+    """
+    Encode la tierlist en PNG au fil des bandes, sans jamais construire l'image complète
+    en mémoire : seule une bande et le flux compressé sont conservés.
+    :return: générateur de morceaux d'octets du fichier PNG
+    """
+    hauteur_totale, bandes = generer_bandes_tierlist(tiers, chemin_drapeaux)
+    yield b'\x89PNG\r\n\x1a\n'
+    # Largeur, hauteur, 8 bits, RGB, compression/filtre/entrelacement par défaut
+    yield _chunk_png(b'IHDR', struct.pack('>IIBBBBB', LARGEUR_IMAGE, hauteur_totale, 8, 2, 0, 0, 0))
+
+    compresseur = zlib.compressobj(6)
+    taille_ligne = LARGEUR_IMAGE * 3
+    duree_encodage = 0.0
+    for _, bande in bandes:
+        debut = time.perf_counter()
+        brut = bande.tobytes()
+        # Filtre PNG "None" (octet 0) en tête de chaque ligne de pixels
+        lignes = b''.join(b'\x00' + brut[i:i + taille_ligne] for i in range(0, len(brut), taille_ligne))
+        compresse = compresseur.compress(lignes)
+        duree_encodage += time.perf_counter() - debut
+        if compresse:
+            yield _chunk_png(b'IDAT', compresse)
+    yield _chunk_png(b'IDAT', compresseur.flush())
+    yield _chunk_png(b'IEND', b'')
+    observer('encodage_duree_secondes', duree_encodage, format='png')
+
+def creer_png_tierlist(tiers, chemin_drapeaux):
+    """
+    Retourne la tierlist encodée en PNG (bytes), rendue par bandes.
+    """
+    with chronometrer('rendu_duree_secondes', format='png'):
+        return b''.join(generer_png_tierlist(tiers, chemin_drapeaux))
+
+@lru_cache(maxsize=1024)
+def obtenir_drapeau_redimensionne(tag, chemin_drapeaux, taille):
+    """
+    Drapeau du pays redimensionné et converti en RGB, mis en cache entre les rendus.
+    """
+    image_drapeau = obtenir_image_drapeau_pays(tag, chemin_drapeaux)
+    if image_drapeau is None:
+        return None
+    return image_drapeau.convert('RGB').resize((taille, taille))
+
+def _collecter_cache_drapeaux():
+    infos = obtenir_drapeau_redimensionne.cache_info()
+    return [
+        ('counter', 'cache_drapeaux_total', (('resultat', 'hit'),), infos.hits),
+        ('counter', 'cache_drapeaux_total', (('resultat', 'miss'),), infos.misses),
+    ]
+
+enregistrer_collecteur(_collecter_cache_drapeaux)
 
 def obtenir_image_drapeau_pays(tag, chemin_drapeaux):
     extensions_possibles = ['.png', '.jpg', '.jpeg', '.tga']
@@ -0,0 +1,87 @@
+# image_svg.py
+
+import base64
+import io
+from functools import lru_cache
+from xml.sax.saxutils import escape
+from constants import COULEURS_TIERS
+from metriques import chronometrer
+from image_generation import (
+    calculer_disposition,
+    texte_carte,
+    obtenir_drapeau_redimensionne,
+    LARGEUR_IMAGE,
+    TAILLE_DRAPEAU,
+    DECALAGE_TEXTE,
+)
+
+POLICE = "Arial, Helvetica, sans-serif"
+INTERLIGNE = 17
+
+@lru_cache(maxsize=1024)
+def _drapeau_base64(tag, chemin_drapeaux):
+    """
+    Drapeau encodé une seule fois en PNG base64 pour être inclus comme symbole SVG.
+    """
+    image_drapeau = obtenir_drapeau_redimensionne(tag, chemin_drapeaux, TAILLE_DRAPEAU)
+    if image_drapeau is None:
+        return None
+    buf = io.BytesIO()
+    image_drapeau.save(buf, format='PNG')
+    return base64.b64encode(buf.getvalue()).decode('ascii')
+
+def generer_svg_tierlist(tiers, chemin_drapeaux):
+    """
+    Génère la tierlist au format SVG, morceau par morceau.
+    Les drapeaux sont déclarés une fois dans <defs> et référencés par <use>,
+    le texte reste du texte SVG natif.
+    :param tiers: dict tier -> list of (tag, stats)
+    :return: générateur de str
+    """
+    lignes, hauteur_totale = calculer_disposition(tiers)
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+           f'width="{LARGEUR_IMAGE}" height="{hauteur_totale}" '
+           f'viewBox="0 0 {LARGEUR_IMAGE} {hauteur_totale}" font-family="{POLICE}">\n')
+
+    # Sprites des drapeaux
+    yield '<defs>\n'
+    drapeaux = {}
+    for ligne in lignes:
+        for tag, _, _ in ligne.cartes:
+            if tag in drapeaux:
+                continue
+            donnees_png = _drapeau_base64(tag, chemin_drapeaux)
+            drapeaux[tag] = donnees_png is not None
+            if drapeaux[tag]:
+                yield (f'<symbol id="drapeau-{tag}" viewBox="0 0 {TAILLE_DRAPEAU} {TAILLE_DRAPEAU}">'
+                       f'<image width="{TAILLE_DRAPEAU}" height="{TAILLE_DRAPEAU}" '
+                       f'xlink:href="data:image/png;base64,{donnees_png}"/></symbol>\n')
+    yield '</defs>\n'
+
+    for ligne in lignes:
+        yield (f'<rect x="0" y="{ligne.y0}" width="{LARGEUR_IMAGE}" height="{ligne.hauteur}" '
+               f'fill="{COULEURS_TIERS[ligne.tier]}"/>\n')
+        if ligne.premiere:
+            yield f'<text x="10" y="{ligne.y0 + 30}" font-size="20">Tier {ligne.tier}</text>\n'
+        y = ligne.y_cartes
+        for tag, donnees, x in ligne.cartes:
+            if drapeaux[tag]:
+                yield (f'<use xlink:href="#drapeau-{tag}" x="{x}" y="{y}" '
+                       f'width="{TAILLE_DRAPEAU}" height="{TAILLE_DRAPEAU}"/>\n')
+            else:
+                # Rectangle gris pour le drapeau manquant
+                yield (f'<rect x="{x}" y="{y}" width="{TAILLE_DRAPEAU}" height="{TAILLE_DRAPEAU}" '
+                       f'fill="#CCCCCC" stroke="#999999"/>\n')
+            yield f'<text x="{x}" y="{y + DECALAGE_TEXTE}" font-size="14" dominant-baseline="hanging">'
+            for num, texte in enumerate(texte_carte(tag, donnees).split('\n')):
+                dy = 0 if num == 0 else INTERLIGNE
+                yield f'<tspan x="{x}" dy="{dy}">{escape(texte)}</tspan>'
+            yield '</text>\n'
+    yield '</svg>\n'
+
+def creer_svg_tierlist(tiers, chemin_drapeaux):
+    """
+    Retourne la tierlist au format SVG (str).
+    """
+    with chronometrer('rendu_duree_secondes', format='svg'):
+        return ''.join(generer_svg_tierlist(tiers, chemin_drapeaux))
@@ -2,38 +2,90 @@
 
 import streamlit as st
 from data_processing import (
-    obtenir_dump_donnees_pays,
-    extraire_pays_joues,
+    obtenir_dumps_multiples,
+    fusionner_dumps,
     accumuler_statistiques_pays,
     calculer_scores_et_tiers,
-    calculer_pertes_militaires,
+    calculer_classements_pays,
+)
+from classements import METRIQUES, CLASSEMENTS, calculer_classements, sous_table
+from regions import (
+    regions_connues,
+    partitionner_par_region,
+    tags_des_regions,
+    filtrer_par_regions,
+    filtrer_lignes_par_regions,
+)
+from image_generation import creer_png_tierlist
+from image_svg import creer_svg_tierlist
+from export_donnees import (
+    exporter_donnees_csv,
+    exporter_donnees_jsonl,
+    exporter_donnees_parquet,
+    exporter_donnees_arrow,
+    arrow_disponible,
+)
+from prechargement import PlanificateurPrechargement
+from profilage import capturer_profil
+from metriques import chronometrer, signaler_session, estimer_taille, demarrer_serveur_metriques, demarrer_ecriture_fichier
+from constants import (
+    CLE_API, CHEMIN_DRAPEAUX, POIDS_DEFAUT, TYPES_DUMP_ANNEXES,
+    PORT_METRIQUES, FICHIER_METRIQUES, INTERVALLE_FICHIER_METRIQUES, INTERVALLE_ESTIMATION_SESSION,
+    PROFILAGE_ACTIF,
 )
-from image_generation import creer_image_tierlist
-from constants import CLE_API, CHEMIN_DRAPEAUX
 import os
 import logging
 from utils import initialiser_logging, get_message
-import io
-from PIL import Image
-import csv
 import time
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-def exporter_image(image_tierlist, format='PNG'):
+def exporter_image(image_tierlist):
     """
-    Convertit l'image en bytes pour l'export
+    Retourne l'image pour l'export : elle est déjà encodée en PNG (rendu par bandes)
     """
-    if isinstance(image_tierlist, Image.Image):
-        # Si c'est déjà une image PIL
-        img = image_tierlist
-    else:
-        # Si c'est un buffer d'image
-        img = Image.open(io.BytesIO(image_tierlist))
-    
-    # Créer un buffer pour sauvegarder l'image
-    buf = io.BytesIO()
-    img.save(buf, format=format)
-    buf.seek(0)
-    return buf.getvalue()
+    return image_tierlist
+
+@st.cache_resource
+def demarrer_metriques():
+    """
+    Démarre une seule fois par processus l'exposition des métriques configurée
+    """
+    if PORT_METRIQUES:
+        demarrer_serveur_metriques(PORT_METRIQUES)
+    if FICHIER_METRIQUES:
+        demarrer_ecriture_fichier(FICHIER_METRIQUES, INTERVALLE_FICHIER_METRIQUES)
+    return True
+
+def signaler_session_courante():
+    """
+    Signale la session courante aux métriques. La taille de son état n'est réestimée
+    qu'après INTERVALLE_ESTIMATION_SESSION secondes, ou après une nouvelle génération
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    maintenant = time.monotonic()
+    taille = st.session_state.get('taille_session_estimee')
+    if taille is None or maintenant - st.session_state.taille_session_horodatage > INTERVALLE_ESTIMATION_SESSION:
+        taille = sum(estimer_taille(valeur) for cle, valeur in st.session_state.to_dict().items()
+                     if cle not in ('taille_session_estimee', 'taille_session_horodatage'))
+        st.session_state.taille_session_estimee = taille
+        st.session_state.taille_session_horodatage = maintenant
+    signaler_session(ctx.session_id, taille)
+
+def profilage_demande():
+    """
+    Profilage activé pour ce rerun : variable d'environnement PROFILAGE=1
+    ou paramètre d'URL caché ?profil=1
+    """
+    return PROFILAGE_ACTIF or st.experimental_get_query_params().get('profil') == ['1']
+
+@st.cache_resource
+def obtenir_planificateur():
+    """
+    Planificateur de préchargement partagé par toutes les sessions du serveur
+    """
+    return PlanificateurPrechargement(CLE_API)
 
 def mettre_a_jour_tierlist():
     """
@@ -42,8 +94,58 @@ def mettre_a_jour_tierlist():
     if 'stats_pays' not in st.session_state:
         return None
     
-    tiers = calculer_scores_et_tiers(st.session_state.stats_pays, st.session_state.poids)
-    return creer_image_tierlist(tiers, CHEMIN_DRAPEAUX)
+    return creer_png_tierlist(calculer_tiers_courants(), CHEMIN_DRAPEAUX)
+
+def pertes_militaires_courantes():
+    """
+    Pertes militaires limitées aux régions sélectionnées, comme la tierlist
+    """
+    return filtrer_lignes_par_regions(
+        st.session_state.pertes_militaires,
+        st.session_state.get('partitions_regions', {}),
+        st.session_state.get('regions_selectionnees', [])
+    )
+
+def classements_courants():
+    """
+    Classements limités aux régions sélectionnées, recalculés sur la sous-table
+    (les classements sont tronqués : filtrer leurs lignes ne suffirait pas)
+    """
+    regions = st.session_state.get('regions_selectionnees', [])
+    if not regions:
+        return st.session_state.classements
+    tags = tags_des_regions(st.session_state.get('partitions_regions', {}), regions)
+    return calculer_classements(sous_table(st.session_state.table_pays, tags), CLASSEMENTS)
+
+def export_en_cache(nom, construire):
+    """
+    Retourne le résultat `nom` de la session (tiers, vues filtrées, exports), reconstruit
+    seulement quand les poids, la stratégie de tiers ou les régions sélectionnées ont changé
+    """
+    cle = (
+        st.session_state.get('id_sauvegarde'),
+        tuple(sorted(st.session_state.poids.items())),
+        st.session_state.get('strategie_tiers', 'percentiles'),
+        tuple(st.session_state.get('regions_selectionnees', [])),
+    )
+    caches = st.session_state.get('exports_caches')
+    if caches is None or caches['cle'] != cle:
+        caches = st.session_state.exports_caches = {'cle': cle}
+    if nom not in caches:
+        caches[nom] = construire()
+    return caches[nom]
+
+def calculer_tiers_courants():
+    """
+    Calcule les tiers avec les poids actuels, limités aux régions sélectionnées
+    """
+    stats_pays = filtrer_par_regions(
+        st.session_state.stats_pays,
+        st.session_state.get('partitions_regions', {}),
+        st.session_state.get('regions_selectionnees', [])
+    )
+    return calculer_scores_et_tiers(stats_pays, st.session_state.poids,
+                                    st.session_state.get('strategie_tiers', 'percentiles'))
 
 def ajuster_autres_poids(poids_modifie, nouvelle_valeur, poids_actuels, poids_verrouilles):
     """
@@ -75,58 +177,34 @@ def ajuster_autres_poids(poids_modifie, nouvelle_valeur, poids_actuels, poids_ve
     
     return nouveaux_poids
 
-def exporter_donnees_csv(tiers, pertes_militaires):
+LIBELLES_STRATEGIES = {
+    'percentiles': "Percentiles fixes (20 %)",
+    'seuils': "Seuils de score absolus",
+    'ruptures_naturelles': "Ruptures naturelles",
+}
+
+LIBELLES_METRIQUES = {
+    'pertes_totales': "Pertes Totales",
+    'pertes_batailles': "Pertes en Bataille",
+    'pertes_attrition': "Pertes par Attrition",
+    'pourcentage_attrition': "% Attrition",
+    'developpement': "Dev",
+    'revenu': "Revenu",
+    'FL': "FL",
+    'pertes_par_developpement': "Pertes / Dev",
+    'nb_provinces': "Provinces",
+    'developpement_par_province': "Dev / Province",
+}
+
+def formater_metrique(nom, valeur):
     """
-    Prépare les données combinées de la tierlist et des pertes militaires pour l'export CSV
+    Formate une valeur de métrique pour l'affichage dans un classement
     """
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # En-têtes
-    writer.writerow(['Type', 'Pays', 'Joueur', 'Tier', 'Score', 'Dev', 'Revenu', 'FL', 'Qualité', 'Pertes Totales', 'Pertes en Bataille', 'Pertes par Attrition', '% Attrition'])
-    
-    # Données de la tierlist
-    pays_tiers = {}
-    for tier, pays_list in tiers.items():
-        for tag, donnees in pays_list:
-            pays_tiers[tag] = {
-                'tier': tier,
-                'score': donnees['score'],
-                'nom': donnees.get('nom', tag),
-                'pseudo_joueur': donnees.get('pseudo_joueur', 'N/A'),
-                'developpement': donnees.get('developpement', 0),
-                'revenu': donnees.get('revenu', 0),
-                'FL': donnees.get('FL', 0),
-                'qualite': donnees.get('qualite', 0)
-            }
-    
-    # Données des pertes
-    pertes_dict = {tag: stats for tag, stats in pertes_militaires}
-    
-    # Combiner les données
-    tous_pays = set(pays_tiers.keys()) | set(pertes_dict.keys())
-    for tag in tous_pays:
-        tier_info = pays_tiers.get(tag, {'tier': 'N/A', 'score': 0, 'nom': tag, 'pseudo_joueur': 'N/A',
-                                        'developpement': 0, 'revenu': 0, 'FL': 0, 'qualite': 0})
-        pertes_info = pertes_dict.get(tag, {'pertes_totales': 0, 'pertes_batailles': 0, 'pertes_attrition': 0, 'pourcentage_attrition': 0})
-        
-        writer.writerow([
-            'Pays',
-            tier_info['nom'],
-            tier_info['pseudo_joueur'],
-            tier_info['tier'],
-            f"{tier_info['score']:.2f}",
-            f"{tier_info['developpement']:.1f}",
-            f"{tier_info['revenu']:.2f}",
-            f"{tier_info['FL']:.1f}",
-            f"{tier_info['qualite']:.2f}",
-            pertes_info['pertes_totales'],
-            pertes_info['pertes_batailles'],
-            pertes_info['pertes_attrition'],
-            f"{pertes_info['pourcentage_attrition']:.1f}"
-        ])
-    
-    return output.getvalue()
+    if METRIQUES[nom].entier:
+        return f"{valeur:,}"
+    if nom == 'pourcentage_attrition':
+        return f"{valeur:.1f}%"
+    return f"{valeur:,.1f}"
 
 def main():
     # Configuration de la page
@@ -134,6 +212,8 @@ def main():
     
     st.title("Générateur de Tierlist EU4")
 
+    demarrer_metriques()
+
     # Initialiser l'état de génération
     if 'genere' not in st.session_state:
         st.session_state.genere = False
@@ -142,7 +222,7 @@ def main():
     if not st.session_state.genere:
         id_col, button_col = st.columns([3, 1])
         with id_col:
-            id_sauvegarde = st.text_input("ID de Sauvegarde Skanderbeg :")
+            id_sauvegarde = st.text_input("ID de Sauvegarde Skanderbeg :").strip()
         with button_col:
             if st.button("Générer les Analyses", type="primary"):
                 if not id_sauvegarde:
@@ -158,6 +238,27 @@ def main():
                 # Stocker l'ID dans session_state pour les exports
                 st.session_state.id_sauvegarde = id_sauvegarde
                 
+                # Résultats déjà précalculés en arrière-plan ?
+                resultats = obtenir_planificateur().obtenir(id_sauvegarde)
+                if resultats is not None:
+                    # Copie des stats : le calcul des scores les modifie par session
+                    st.session_state.stats_pays = {tag: dict(stats) for tag, stats in resultats['stats_pays'].items()}
+                    st.session_state.partitions_regions = resultats['partitions_regions']
+                    st.session_state.table_pays = resultats['table_pays']
+                    st.session_state.pertes_militaires = resultats['pertes_militaires']
+                    st.session_state.classements = resultats['classements']
+                    if (st.session_state.poids == POIDS_DEFAUT
+                            and not st.session_state.get('regions_selectionnees')
+                            and st.session_state.get('strategie_tiers', 'percentiles') == 'percentiles'):
+                        tiers = resultats['tiers']
+                    else:
+                        tiers = calculer_tiers_courants()
+                    st.session_state.image_courante = creer_png_tierlist(tiers, CHEMIN_DRAPEAUX)
+                    st.session_state.genere = True
+                    st.session_state.pop('exports_caches', None)
+                    st.session_state.pop('taille_session_estimee', None)
+                    st.rerun()
+
                 try:
                     progress_bar = st.progress(0)
                     status_text = st.empty()
@@ -172,19 +273,18 @@ def main():
                     status_text.text("🔄 Récupération des données Skanderbeg...")
                     progress_bar.progress(20)
                     
-                    dump_donnees = obtenir_dump_donnees_pays(id_sauvegarde, CLE_API)
-                    if not dump_donnees:
-                        st.error("Impossible de récupérer les données des pays.")
-                        return
+                    # Tous les types de dump sont téléchargés et parsés en parallèle
+                    with chronometrer('pipeline_etape_duree_secondes', etape='telechargement'):
+                        dumps = obtenir_dumps_multiples(id_sauvegarde, CLE_API, ['countriesData'] + TYPES_DUMP_ANNEXES)
                     
                     # Animation intermédiaire
                     status_text.text("📊 Analyse des données en cours...")
                     progress_bar.progress(40)
                     time.sleep(0.3)
                     
-                    result = extraire_pays_joues(dump_donnees)
+                    result = fusionner_dumps(dumps)
                     if not result:
-                        st.error("Impossible d'extraire les pays joués.")
+                        st.error("Impossible de récupérer ou d'extraire les pays joués.")
                         return
                         
                     pays_joues, dict_pays = result
@@ -193,21 +293,28 @@ def main():
                     time.sleep(0.3)
                     
                     # Calcul des statistiques pour la tierlist
-                    stats_pays = accumuler_statistiques_pays(pays_joues, dict_pays)
-                    st.session_state.stats_pays = stats_pays
+                    with chronometrer('pipeline_etape_duree_secondes', etape='statistiques'):
+                        stats_pays = accumuler_statistiques_pays(pays_joues, dict_pays)
+                        st.session_state.stats_pays = stats_pays
+                        st.session_state.partitions_regions = partitionner_par_region(pays_joues)
                     
                     # Calcul des pertes militaires
                     status_text.text("⚔️ Analyse des pertes militaires...")
-                    pertes_triees = calculer_pertes_militaires(pays_joues, dict_pays)
+                    with chronometrer('pipeline_etape_duree_secondes', etape='classements'):
+                        table_pays, pertes_triees, classements = calculer_classements_pays(pays_joues)
+                    st.session_state.table_pays = table_pays
                     st.session_state.pertes_militaires = pertes_triees
+                    st.session_state.classements = classements
                     
                     progress_bar.progress(80)
                     status_text.text("🎨 Génération de la tierlist...")
                     time.sleep(0.3)
 
                     # Génération de la tierlist
-                    tiers = calculer_scores_et_tiers(stats_pays, st.session_state.poids)
-                    image_tierlist = creer_image_tierlist(tiers, CHEMIN_DRAPEAUX)
+                    with chronometrer('pipeline_etape_duree_secondes', etape='tiers'):
+                        tiers = calculer_tiers_courants()
+                    with chronometrer('pipeline_etape_duree_secondes', etape='rendu'):
+                        image_tierlist = creer_png_tierlist(tiers, CHEMIN_DRAPEAUX)
                     st.session_state.image_courante = image_tierlist
                     
                     progress_bar.progress(100)
@@ -218,6 +325,8 @@ def main():
                     
                     # Marquer comme généré
                     st.session_state.genere = True
+                    st.session_state.pop('exports_caches', None)
+                    st.session_state.pop('taille_session_estimee', None)
                     st.rerun()
 
                 except Exception as e:
@@ -233,12 +342,7 @@ def main():
         with st.expander("Modifier les poids", expanded=True):
             # Initialisation des poids et des verrouillages
             if 'poids' not in st.session_state:
-                st.session_state.poids = {
-                    'developpement': 0.3,
-                    'revenu': 0.3,
-                    'FL': 0.2,
-                    'qualite': 0.2
-                }
+                st.session_state.poids = dict(POIDS_DEFAUT)
             if 'poids_verrouilles' not in st.session_state:
                 st.session_state.poids_verrouilles = set()
             
@@ -312,22 +416,61 @@ def main():
             
             # Bouton pour réinitialiser les poids
             if st.button("Réinitialiser les poids", key='reset_button'):
-                st.session_state.poids = {
-                    'developpement': 0.3,
-                    'revenu': 0.3,
-                    'FL': 0.2,
-                    'qualite': 0.2
-                }
+                st.session_state.poids = dict(POIDS_DEFAUT)
                 st.session_state.poids_verrouilles = set()  # Déverrouiller tous les poids
                 # Réinitialiser les valeurs des sliders
-                st.session_state.developpement_slider = 30
-                st.session_state.revenu_slider = 30
-                st.session_state.FL_slider = 20
-                st.session_state.qualite_slider = 20
+                for nom_poids, valeur in POIDS_DEFAUT.items():
+                    st.session_state[f'{nom_poids}_slider'] = int(valeur * 100)
                 if 'stats_pays' in st.session_state:
                     st.session_state.image_courante = mettre_a_jour_tierlist()
                 st.rerun()
         
+        # Méthode de répartition des tiers (recalcul local, sans retéléchargement)
+        st.header("Répartition des tiers")
+        def on_strategie_change():
+            if 'stats_pays' in st.session_state:
+                st.session_state.image_courante = mettre_a_jour_tierlist()
+        st.selectbox(
+            "Méthode :",
+            list(LIBELLES_STRATEGIES),
+            format_func=LIBELLES_STRATEGIES.get,
+            key='strategie_tiers',
+            on_change=on_strategie_change
+        )
+
+        # Filtre par région (servi depuis les partitions précalculées)
+        if 'partitions_regions' in st.session_state:
+            st.header("Régions")
+            def on_regions_change():
+                st.session_state.image_courante = mettre_a_jour_tierlist()
+            st.multiselect(
+                "Limiter aux régions :",
+                [r for r in regions_connues() if r in st.session_state.partitions_regions],
+                key='regions_selectionnees',
+                on_change=on_regions_change,
+                help="S'applique à la tierlist, aux pertes, aux classements et aux exports. "
+                     "Laisser vide pour inclure toutes les régions"
+            )
+
+        # Campagnes surveillées (préchargement en arrière-plan)
+        st.header("Campagnes surveillées")
+        with st.expander("Précharger une sauvegarde", expanded=False):
+            planificateur = obtenir_planificateur()
+            # Seules les sauvegardes demandées par cette session sont affichées
+            if 'sauvegardes_surveillees' not in st.session_state:
+                st.session_state.sauvegardes_surveillees = []
+            id_surveille = st.text_input("ID de Sauvegarde à surveiller :", key='id_surveille').strip()
+            if st.button("Surveiller", key='surveiller_button'):
+                if not CLE_API:
+                    st.error("La clé API n'est pas définie. Veuillez la définir dans constants.py.")
+                elif id_surveille:
+                    if not planificateur.surveiller(id_surveille):
+                        st.error("Trop de sauvegardes sont déjà surveillées. Réessayez plus tard.")
+                    elif id_surveille not in st.session_state.sauvegardes_surveillees:
+                        st.session_state.sauvegardes_surveillees.append(id_surveille)
+            for id_sauvegarde, statut in planificateur.etat(st.session_state.sauvegardes_surveillees).items():
+                st.write(f"{id_sauvegarde} : {statut}")
+
         # Options d'export
         if 'image_courante' in st.session_state and 'pertes_militaires' in st.session_state:
             st.header("Télécharger")
@@ -335,25 +478,56 @@ def main():
             # Export PNG
             st.download_button(
                 "Télécharger Tierlist (PNG)",
-                data=exporter_image(st.session_state.image_courante, 'PNG'),
+                data=exporter_image(st.session_state.image_courante),
                 file_name=f"tierlist_{st.session_state.id_sauvegarde}.png",
                 mime="image/png"
             )
             
+            tiers = export_en_cache('tiers', calculer_tiers_courants)
+
+            # Export SVG (vectoriel, pour intégration web)
+            st.download_button(
+                "Télécharger Tierlist (SVG)",
+                data=export_en_cache('svg', lambda: creer_svg_tierlist(tiers, CHEMIN_DRAPEAUX)),
+                file_name=f"tierlist_{st.session_state.id_sauvegarde}.svg",
+                mime="image/svg+xml"
+            )
+
+            pertes_militaires = export_en_cache('pertes_militaires', pertes_militaires_courantes)
+
             # Export CSV combiné
-            tiers = calculer_scores_et_tiers(st.session_state.stats_pays, st.session_state.poids)
-            csv_data = exporter_donnees_csv(tiers, st.session_state.pertes_militaires)
             st.download_button(
                 "Télécharger Données (CSV)",
-                data=csv_data,
+                data=export_en_cache('csv', lambda: exporter_donnees_csv(tiers, pertes_militaires)),
                 file_name=f"donnees_{st.session_state.id_sauvegarde}.csv",
                 mime="text/csv"
             )
 
+            # Exports typés pour l'analyse (JSON Lines, et Parquet/Arrow si pyarrow est installé)
+            st.download_button(
+                "Télécharger Données (JSONL)",
+                data=export_en_cache('jsonl', lambda: exporter_donnees_jsonl(tiers, pertes_militaires)),
+                file_name=f"donnees_{st.session_state.id_sauvegarde}.jsonl",
+                mime="application/x-ndjson"
+            )
+            if arrow_disponible():
+                st.download_button(
+                    "Télécharger Données (Parquet)",
+                    data=export_en_cache('parquet', lambda: exporter_donnees_parquet(tiers, pertes_militaires)),
+                    file_name=f"donnees_{st.session_state.id_sauvegarde}.parquet",
+                    mime="application/vnd.apache.parquet"
+                )
+                st.download_button(
+                    "Télécharger Données (Arrow)",
+                    data=export_en_cache('arrow', lambda: exporter_donnees_arrow(tiers, pertes_militaires)),
+                    file_name=f"donnees_{st.session_state.id_sauvegarde}.arrow",
+                    mime="application/vnd.apache.arrow.file"
+                )
+
     initialiser_logging()
 
     # Onglets principaux
-    tab1, tab2 = st.tabs(["Tierlist", "Pertes Militaires"])
+    tab1, tab2, tab3 = st.tabs(["Tierlist", "Pertes Militaires", "Classements"])
 
     with tab1:
         if 'image_courante' in st.session_state:
@@ -366,7 +540,7 @@ def main():
         if 'pertes_militaires' in st.session_state:
             # Créer un DataFrame pour un affichage plus propre
             data = []
-            for tag, stats in st.session_state.pertes_militaires:
+            for tag, stats in export_en_cache('pertes_militaires', pertes_militaires_courantes):
                 data.append({
                     "Pays": stats['nom'],
                     "Joueur": stats['pseudo_joueur'],
@@ -391,5 +565,34 @@ def main():
                 use_container_width=True
             )
 
+    with tab3:
+        if 'classements' in st.session_state:
+            for classement, lignes in export_en_cache('classements', classements_courants):
+                st.subheader(classement.titre)
+                if not lignes:
+                    st.write("Aucun pays concerné.")
+                    continue
+                data = []
+                for tag, stats in lignes:
+                    ligne = {"Pays": stats['nom'], "Joueur": stats['pseudo_joueur']}
+                    for nom in classement.colonnes:
+                        ligne[LIBELLES_METRIQUES[nom]] = formater_metrique(nom, stats[nom])
+                    data.append(ligne)
+                st.dataframe(data, hide_index=True, use_container_width=True)
+
+def executer():
+    """
+    Exécute un rerun ; la session est signalée aux métriques même en cas de
+    `return` anticipé ou de st.rerun()
+    """
+    try:
+        main()
+    finally:
+        signaler_session_courante()
+
 if __name__ == "__main__":
-    main()
+    if profilage_demande():
+        with capturer_profil(lambda: st.session_state.get('id_sauvegarde')):
+            executer()
+    else:
+        executer()
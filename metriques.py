@@ -0,0 +1,233 @@
+# metriques.py
+
+import os
+import sys
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bornes (en secondes) des histogrammes de durée
+BORNES_DUREES = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Une session sans rerun depuis ce délai (secondes) n'est plus comptée
+DELAI_SESSION_INACTIVE = 1800
+
+DESCRIPTIONS = {
+    'skanderbeg_requetes_total': "Requêtes vers l'API Skanderbeg par type de dump et statut HTTP",
+    'skanderbeg_requete_duree_secondes': "Durée des requêtes vers l'API Skanderbeg",
+    'pipeline_etape_duree_secondes': "Durée de chaque étape du pipeline de génération",
+    'rendu_duree_secondes': "Durée de rendu de la tierlist par format",
+    'encodage_duree_secondes': "Durée d'encodage des images et exports par format",
+    'cache_drapeaux_total': "Accès au cache des drapeaux redimensionnés",
+    'cache_resultats_total': "Accès au cache des résultats préchargés",
+    'sessions_recentes': f"Sessions ayant fait un rerun dans les {DELAI_SESSION_INACTIVE // 60} dernières "
+                         f"minutes (pas forcément encore ouvertes)",
+    'sessions_memoire_octets': "Mémoire approximative de l'état des sessions récentes",
+}
+
+# Étapes chronométrées du thread courant, quand une capture de profil est en cours
+_capture = threading.local()
+
+@contextmanager
+def capturer_etapes():
+    """
+    Collecte les durées chronométrées dans le thread courant.
+    :return: list de (nom, labels, durée) remplie au fil de l'exécution
+    """
+    etapes = []
+    _capture.etapes = etapes
+    try:
+        yield etapes
+    finally:
+        _capture.etapes = None
+
+class RegistreMetriques:
+    """
+    Registre en mémoire des compteurs et histogrammes, partagé par tout le processus.
+    Les jauges sont calculées à l'export par des collecteurs.
+    """
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._compteurs = {}       # (nom, labels) -> valeur
+        self._histogrammes = {}    # (nom, labels) -> [comptes par borne, somme, nombre]
+        self._collecteurs = []     # fonctions appelées à l'export, retournent [(type, nom, labels, valeur)]
+        self._sessions = {}        # id de session -> (dernier rerun, taille approximative)
+
+    @staticmethod
+    def _cle(nom, labels):
+        return nom, tuple(sorted(labels.items()))
+
+    def incrementer(self, nom, valeur=1, **labels):
+        cle = self._cle(nom, labels)
+        with self._verrou:
+            self._compteurs[cle] = self._compteurs.get(cle, 0) + valeur
+
+    def observer(self, nom, valeur, **labels):
+        cle = self._cle(nom, labels)
+        with self._verrou:
+            histogramme = self._histogrammes.get(cle)
+            if histogramme is None:
+                histogramme = self._histogrammes[cle] = [[0] * len(BORNES_DUREES), 0.0, 0]
+            for i, borne in enumerate(BORNES_DUREES):
+                if valeur <= borne:
+                    histogramme[0][i] += 1
+            histogramme[1] += valeur
+            histogramme[2] += 1
+
+    @contextmanager
+    def chronometrer(self, nom, **labels):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            duree = time.perf_counter() - debut
+            self.observer(nom, duree, **labels)
+            etapes = getattr(_capture, 'etapes', None)
+            if etapes is not None:
+                etapes.append((nom, labels, duree))
+
+    def enregistrer_collecteur(self, collecteur):
+        with self._verrou:
+            self._collecteurs.append(collecteur)
+
+    def signaler_session(self, id_session, taille_octets):
+        with self._verrou:
+            self._sessions[id_session] = (time.monotonic(), taille_octets)
+
+    def _collecter_sessions(self):
+        limite = time.monotonic() - DELAI_SESSION_INACTIVE
+        with self._verrou:
+            for id_session in [s for s, (vu, _) in self._sessions.items() if vu < limite]:
+                del self._sessions[id_session]
+            recentes = list(self._sessions.values())
+        return [
+            ('gauge', 'sessions_recentes', (), len(recentes)),
+            ('gauge', 'sessions_memoire_octets', (), sum(taille for _, taille in recentes)),
+        ]
+
+    def exposer_texte(self):
+        """
+        Retourne toutes les métriques au format texte Prometheus.
+        """
+        echantillons = self._collecter_sessions()
+        for collecteur in list(self._collecteurs):
+            try:
+                echantillons.extend(collecteur())
+            except Exception as e:
+                logging.error(f"Erreur dans un collecteur de métriques : {e}")
+
+        with self._verrou:
+            for (nom, labels), valeur in self._compteurs.items():
+                echantillons.append(('counter', nom, labels, valeur))
+            histogrammes = [(nom, labels, list(comptes), somme, nombre)
+                            for (nom, labels), (comptes, somme, nombre) in self._histogrammes.items()]
+
+        par_nom = {}
+        for type_metrique, nom, labels, valeur in echantillons:
+            par_nom.setdefault(nom, (type_metrique, []))[1].append((nom, labels, valeur))
+        for nom, labels, comptes, somme, nombre in histogrammes:
+            lignes = par_nom.setdefault(nom, ('histogram', []))[1]
+            for borne, compte in zip(BORNES_DUREES, comptes):
+                lignes.append((f'{nom}_bucket', labels + (('le', str(borne)),), compte))
+            lignes.append((f'{nom}_bucket', labels + (('le', '+Inf'),), nombre))
+            lignes.append((f'{nom}_sum', labels, somme))
+            lignes.append((f'{nom}_count', labels, nombre))
+
+        sortie = []
+        for nom in sorted(par_nom):
+            type_metrique, lignes = par_nom[nom]
+            if nom in DESCRIPTIONS:
+                sortie.append(f'# HELP {nom} {DESCRIPTIONS[nom]}')
+            sortie.append(f'# TYPE {nom} {type_metrique}')
+            for nom_ligne, labels, valeur in lignes:
+                sortie.append(f'{nom_ligne}{_formater_labels(labels)} {valeur}')
+        return '\n'.join(sortie) + '\n'
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _formater_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{cle}="{_echapper(valeur)}"' for cle, valeur in labels) + '}'
+
+REGISTRE = RegistreMetriques()
+
+incrementer = REGISTRE.incrementer
+observer = REGISTRE.observer
+chronometrer = REGISTRE.chronometrer
+enregistrer_collecteur = REGISTRE.enregistrer_collecteur
+signaler_session = REGISTRE.signaler_session
+exposer_texte = REGISTRE.exposer_texte
+
+def estimer_taille(valeur, profondeur=4):
+    """
+    Estimation grossière (en octets) de la mémoire occupée par une valeur de session.
+    """
+    if isinstance(valeur, (bytes, bytearray, str)):
+        return len(valeur)
+    if hasattr(valeur, 'size') and hasattr(valeur, 'getbands'):
+        # Image PIL : largeur * hauteur * canaux
+        largeur, hauteur = valeur.size
+        return largeur * hauteur * len(valeur.getbands())
+    if hasattr(valeur, 'nbytes'):
+        return int(valeur.nbytes)
+    taille = sys.getsizeof(valeur)
+    if profondeur > 0:
+        if isinstance(valeur, dict):
+            taille += sum(estimer_taille(k, profondeur - 1) + estimer_taille(v, profondeur - 1)
+                          for k, v in valeur.items())
+        elif isinstance(valeur, (list, tuple, set)):
+            taille += sum(estimer_taille(v, profondeur - 1) for v in valeur)
+    return taille
+
+class _GestionnaireMetriques(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        corps = exposer_texte().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        # Pas de journalisation de chaque collecte
+        pass
+
+def demarrer_serveur_metriques(port, hote='127.0.0.1'):
+    """
+    Expose les métriques sur http://hote:port/metrics dans un thread en arrière-plan.
+    Retourne None si le serveur ne peut pas démarrer : l'application continue sans lui.
+    """
+    try:
+        serveur = ThreadingHTTPServer((hote, port), _GestionnaireMetriques)
+    except OSError as e:
+        logging.error(f"❌ Impossible d'exposer les métriques sur le port {port} : {e}")
+        return None
+    threading.Thread(target=serveur.serve_forever, name='serveur-metriques', daemon=True).start()
+    logging.info(f"📈 Métriques exposées sur http://{hote}:{port}/metrics")
+    return serveur
+
+def demarrer_ecriture_fichier(chemin, intervalle=15):
+    """
+    Écrit périodiquement les métriques dans un fichier (remplacement atomique).
+    """
+    def boucle():
+        while True:
+            try:
+                temporaire = f"{chemin}.tmp"
+                with open(temporaire, 'w', encoding='utf-8') as f:
+                    f.write(exposer_texte())
+                os.replace(temporaire, chemin)
+            except OSError as e:
+                logging.error(f"Erreur lors de l'écriture des métriques : {e}")
+            time.sleep(intervalle)
+
+    thread = threading.Thread(target=boucle, name='fichier-metriques', daemon=True)
+    thread.start()
+    return thread
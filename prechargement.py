@@ -0,0 +1,174 @@
+# prechargement.py
+
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from data_processing import (
+    obtenir_dumps_multiples,
+    fusionner_dumps,
+    accumuler_statistiques_pays,
+    calculer_scores_et_tiers,
+    calculer_classements_pays,
+)
+from constants import (
+    POIDS_DEFAUT,
+    PRECHARGEMENT_MAX_WORKERS,
+    PRECHARGEMENT_DELAI_INITIAL,
+    PRECHARGEMENT_DELAI_MAX,
+    PRECHARGEMENT_TAILLE_CACHE,
+    PRECHARGEMENT_MAX_SURVEILLES,
+    PRECHARGEMENT_MAX_TENTATIVES,
+    TYPES_DUMP_ANNEXES,
+)
+from regions import partitionner_par_region
+from metriques import incrementer, chronometrer
+
+class PlanificateurPrechargement:
+    """
+    Surveille des IDs de sauvegarde et précalcule les analyses en arrière-plan
+    dès que le dump est disponible sur Skanderbeg, pour que la première
+    requête interactive soit servie depuis le cache.
+    """
+
+    def __init__(self, cle_api, max_workers=PRECHARGEMENT_MAX_WORKERS,
+                 delai_initial=PRECHARGEMENT_DELAI_INITIAL,
+                 delai_max=PRECHARGEMENT_DELAI_MAX,
+                 taille_cache=PRECHARGEMENT_TAILLE_CACHE,
+                 max_surveilles=PRECHARGEMENT_MAX_SURVEILLES,
+                 max_tentatives=PRECHARGEMENT_MAX_TENTATIVES):
+        self.cle_api = cle_api
+        self.delai_initial = delai_initial
+        self.delai_max = delai_max
+        self.taille_cache = taille_cache
+        self.max_surveilles = max_surveilles
+        self.max_tentatives = max_tentatives
+
+        self._verrou = threading.Lock()
+        self._surveilles = {}          # id -> {'prochaine_tentative', 'delai', 'tentatives'}
+        self._en_cours = set()
+        self._cache = OrderedDict()    # id -> résultats précalculés (LRU)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='prechargement')
+        self._thread = threading.Thread(target=self._boucle, name='planificateur', daemon=True)
+        self._thread.start()
+
+    def surveiller(self, id_sauvegarde):
+        """
+        Ajoute un ID de sauvegarde à surveiller. Sans effet s'il est déjà en cache.
+        :return: False si la liste de surveillance est pleine, True sinon
+        """
+        id_sauvegarde = id_sauvegarde.strip()
+        if not id_sauvegarde:
+            return True
+        with self._verrou:
+            if id_sauvegarde in self._cache or id_sauvegarde in self._surveilles:
+                return True
+            if len(self._surveilles) >= self.max_surveilles:
+                return False
+            self._surveilles[id_sauvegarde] = {
+                'prochaine_tentative': time.monotonic(),
+                'delai': self.delai_initial,
+                'tentatives': 0
+            }
+        logging.info(f"👀 Sauvegarde {id_sauvegarde} ajoutée à la surveillance.")
+        return True
+
+    def obtenir(self, id_sauvegarde):
+        """
+        Retourne les résultats précalculés pour cette sauvegarde, ou None.
+        """
+        id_sauvegarde = id_sauvegarde.strip()
+        with self._verrou:
+            resultats = self._cache.get(id_sauvegarde)
+            if resultats is not None:
+                self._cache.move_to_end(id_sauvegarde)
+        incrementer('cache_resultats_total', resultat='hit' if resultats is not None else 'miss')
+        return resultats
+
+    def etat(self, ids_sauvegardes):
+        """
+        Retourne un dict id -> statut lisible pour l'interface, limité aux IDs donnés
+        (ceux de la session courante : les autres visiteurs ne sont pas exposés).
+        """
+        etats = {}
+        with self._verrou:
+            for id_sauvegarde in ids_sauvegardes:
+                infos = self._surveilles.get(id_sauvegarde)
+                if id_sauvegarde in self._cache:
+                    etats[id_sauvegarde] = 'prêt'
+                elif infos is None:
+                    etats[id_sauvegarde] = 'plus surveillée'
+                elif id_sauvegarde in self._en_cours:
+                    etats[id_sauvegarde] = 'en cours'
+                else:
+                    etats[id_sauvegarde] = f"en attente ({infos['tentatives']} tentative(s))"
+        return etats
+
+    def _boucle(self):
+        while True:
+            maintenant = time.monotonic()
+            with self._verrou:
+                a_lancer = [id_sauvegarde for id_sauvegarde, infos in self._surveilles.items()
+                            if id_sauvegarde not in self._en_cours
+                            and infos['prochaine_tentative'] <= maintenant]
+                self._en_cours.update(a_lancer)
+            for id_sauvegarde in a_lancer:
+                self._executor.submit(self._precalculer, id_sauvegarde)
+            time.sleep(1)
+
+    def _precalculer(self, id_sauvegarde):
+        try:
+            resultats = calculer_resultats_sauvegarde(id_sauvegarde, self.cle_api)
+        except Exception as e:
+            logging.error(f"❌ Erreur lors du préchargement de {id_sauvegarde} : {e}")
+            resultats = None
+
+        with self._verrou:
+            self._en_cours.discard(id_sauvegarde)
+            infos = self._surveilles.get(id_sauvegarde)
+            if resultats is None:
+                # Dump pas encore disponible : nouvelle tentative avec backoff
+                if infos is not None:
+                    infos['tentatives'] += 1
+                    if infos['tentatives'] >= self.max_tentatives:
+                        # ID probablement invalide : ne plus consommer la clé API
+                        del self._surveilles[id_sauvegarde]
+                        logging.warning(f"Sauvegarde {id_sauvegarde} abandonnée après {infos['tentatives']} tentatives.")
+                    else:
+                        infos['prochaine_tentative'] = time.monotonic() + infos['delai']
+                        infos['delai'] = min(infos['delai'] * 2, self.delai_max)
+                return
+            self._surveilles.pop(id_sauvegarde, None)
+            self._cache[id_sauvegarde] = resultats
+            self._cache.move_to_end(id_sauvegarde)
+            while len(self._cache) > self.taille_cache:
+                self._cache.popitem(last=False)
+        logging.info(f"✅ Sauvegarde {id_sauvegarde} préchargée.")
+
+def calculer_resultats_sauvegarde(id_sauvegarde, cle_api):
+    """
+    Exécute le pipeline complet (téléchargement, extraction, statistiques,
+    pertes et tierlist aux poids par défaut) et retourne les résultats, ou None.
+    """
+    with chronometrer('pipeline_etape_duree_secondes', etape='telechargement'):
+        dumps = obtenir_dumps_multiples(id_sauvegarde, cle_api, ['countriesData'] + TYPES_DUMP_ANNEXES)
+    result = fusionner_dumps(dumps)
+    if not result:
+        return None
+    pays_joues, dict_pays = result
+    with chronometrer('pipeline_etape_duree_secondes', etape='statistiques'):
+        stats_pays = accumuler_statistiques_pays(pays_joues, dict_pays)
+    with chronometrer('pipeline_etape_duree_secondes', etape='classements'):
+        table_pays, pertes_militaires, classements = calculer_classements_pays(pays_joues)
+    with chronometrer('pipeline_etape_duree_secondes', etape='tiers'):
+        tiers = calculer_scores_et_tiers(stats_pays, POIDS_DEFAUT)
+    return {
+        'stats_pays': stats_pays,
+        'partitions_regions': partitionner_par_region(pays_joues),
+        'table_pays': table_pays,
+        'pertes_militaires': pertes_militaires,
+        'classements': classements,
+        'tiers': tiers,
+    }
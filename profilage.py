@@ -0,0 +1,56 @@
+# profilage.py
+
+import cProfile
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from metriques import capturer_etapes
+from constants import DOSSIER_PROFILS, PROFILS_MAX
+
+@contextmanager
+def capturer_profil(obtenir_libelle, dossier=DOSSIER_PROFILS, nb_max=PROFILS_MAX):
+    """
+    Profile le bloc (cProfile) et enregistre le profil dans `dossier`, accompagné d'un
+    fichier JSON avec le libellé (ID de sauvegarde) et les durées des étapes.
+    Seuls les `nb_max` profils les plus récents sont conservés.
+    :param obtenir_libelle: fonction appelée à la fin du bloc, retourne le libellé ou None
+    """
+    profil = cProfile.Profile()
+    debut = time.perf_counter()
+    with capturer_etapes() as etapes:
+        profil.enable()
+        try:
+            yield
+        finally:
+            profil.disable()
+            duree_totale = time.perf_counter() - debut
+            try:
+                _enregistrer_profil(profil, obtenir_libelle(), etapes, duree_totale, Path(dossier), nb_max)
+            except Exception as e:
+                logging.error(f"Erreur lors de l'enregistrement du profil : {e}")
+
+def _enregistrer_profil(profil, libelle, etapes, duree_totale, dossier, nb_max):
+    dossier.mkdir(parents=True, exist_ok=True)
+    libelle_fichier = re.sub(r'[^A-Za-z0-9_-]', '_', str(libelle or 'sans_sauvegarde'))[:40]
+    horodatage = time.time()
+    base = dossier / (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(horodatage))}"
+                      f"-{int(horodatage * 1000) % 1000:03d}_{libelle_fichier}")
+
+    profil.dump_stats(f"{base}.prof")
+    with open(f"{base}.json", 'w', encoding='utf-8') as f:
+        json.dump({
+            'id_sauvegarde': libelle,
+            'duree_totale_secondes': duree_totale,
+            'etapes': [{'nom': nom, 'labels': labels, 'duree_secondes': duree}
+                       for nom, labels, duree in etapes],
+        }, f, ensure_ascii=False, indent=2)
+
+    # Dossier borné : supprimer les profils les plus anciens
+    profils = sorted(dossier.glob('*.prof'))
+    for ancien in profils[:-nb_max] if nb_max > 0 else profils:
+        ancien.unlink(missing_ok=True)
+        ancien.with_suffix('.json').unlink(missing_ok=True)
+    logging.debug(f"Profil enregistré : {base}.prof")
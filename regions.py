@@ -0,0 +1,111 @@
+# regions.py
+
+import csv
+import logging
+from functools import lru_cache
+import numpy as np
+from constants import CHEMIN_REGIONS_PROVINCES
+
+# Code 0 réservé aux provinces sans région connue
+REGION_INCONNUE = "Inconnue"
+
+# Plages d'IDs de provinces utilisées quand aucun fichier de correspondance n'est fourni
+# (voir generer_regions_provinces.py). Ces valeurs sont approximatives
+PLAGES_REGIONS_DEFAUT = [
+    (1, 1000, "Europe"),      # Europe de l'Ouest
+    (1001, 2000, "Europe"),   # Europe de l'Est
+    (2001, 3000, "Afrique"),  # Afrique du Nord et Moyen-Orient
+    (3001, 4000, "Asie"),     # Asie
+    (4001, 5000, "Amériques"),  # Amériques
+]
+
+@lru_cache(maxsize=1)
+def charger_index_regions(chemin=CHEMIN_REGIONS_PROVINCES):
+    """
+    Charge une seule fois la table province -> région sous forme de tableau dense
+    indexé par ID de province. Les régions sont celles présentes dans le fichier,
+    dans leur ordre d'apparition.
+    Le fichier CSV attendu contient les colonnes 'province_id' et 'region'.
+    :return: (list des régions, code 0 = REGION_INCONNUE ; np.ndarray des codes)
+    """
+    correspondances = []
+    try:
+        with open(chemin, newline='', encoding='utf-8') as f:
+            for ligne in csv.DictReader(f):
+                try:
+                    correspondances.append((int(ligne['province_id']), ligne['region'].strip()))
+                except (TypeError, ValueError):
+                    logging.warning(f"Ligne ignorée dans {chemin} : {ligne}")
+    except FileNotFoundError:
+        correspondances = [
+            (province_id, region)
+            for debut, fin, region in PLAGES_REGIONS_DEFAUT
+            for province_id in range(debut, fin + 1)
+        ]
+
+    regions = [REGION_INCONNUE] + [region for region in dict.fromkeys(r for _, r in correspondances)
+                                   if region and region != REGION_INCONNUE]
+    codes = {region: code for code, region in enumerate(regions)}
+    taille = max((province_id for province_id, _ in correspondances), default=0) + 1
+    index = np.zeros(taille, dtype=np.int16)
+    for province_id, region in correspondances:
+        if province_id >= 0:
+            index[province_id] = codes.get(region, 0)
+    return regions, index
+
+def regions_connues():
+    """
+    Noms des régions de la table chargée, REGION_INCONNUE en tête.
+    """
+    return charger_index_regions()[0]
+
+def region_province(province_id):
+    """
+    Retourne le nom de la région d'une province, ou REGION_INCONNUE.
+    """
+    regions, index = charger_index_regions()
+    try:
+        province_id = int(province_id)
+    except (TypeError, ValueError):
+        return REGION_INCONNUE
+    if 0 <= province_id < len(index):
+        return regions[index[province_id]]
+    return REGION_INCONNUE
+
+def partitionner_par_region(pays_joues):
+    """
+    Regroupe les tags des pays joués par région, une seule fois à l'ingestion.
+    :return: dict region -> list of tags, dans l'ordre de regions_connues()
+    """
+    partitions = {region: [] for region in regions_connues()}
+    for tag, joueur_info in pays_joues.items():
+        partitions.setdefault(joueur_info['region'], []).append(tag)
+    return {region: tags for region, tags in partitions.items() if tags}
+
+def tags_des_regions(partitions, regions):
+    """
+    Ensemble des tags des régions choisies, lu depuis les partitions précalculées.
+    """
+    return {tag for region in regions for tag in partitions.get(region, [])}
+
+def filtrer_lignes_par_regions(lignes, partitions, regions):
+    """
+    Filtre une liste triée de (tag, dict) sur les régions choisies, en conservant l'ordre.
+    Sans région choisie, la liste est retournée telle quelle.
+    """
+    if not regions:
+        return lignes
+    tags = tags_des_regions(partitions, regions)
+    return [(tag, donnees) for tag, donnees in lignes if tag in tags]
+
+def filtrer_par_regions(stats_pays, partitions, regions):
+    """
+    Sous-ensemble des statistiques pour les régions choisies, lu depuis les partitions
+    précalculées. Sans région choisie, toutes les statistiques sont retournées.
+    """
+    if not regions:
+        return stats_pays
+    return {tag: stats_pays[tag]
+            for region in regions
+            for tag in partitions.get(region, [])
+            if tag in stats_pays}
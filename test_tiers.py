@@ -0,0 +1,28 @@
+# test_tiers.py
+
+from data_processing import _tiers_ruptures_naturelles, calculer_scores_et_tiers
+from constants import POIDS_DEFAUT
+
+def test_ruptures_scores_serres_meme_tier():
+    assert _tiers_ruptures_naturelles([100, 99.99]) == [0, 0]
+    assert _tiers_ruptures_naturelles([100, 99.9, 99.8, 99.7, 99.6]) == [0] * 5
+
+def test_ruptures_scores_egaux_meme_tier():
+    assert _tiers_ruptures_naturelles([80, 80, 80, 80]) == [0] * 4
+
+def test_ruptures_joueur_dominant_seul_en_tete():
+    assert _tiers_ruptures_naturelles([100, 70, 69, 68, 67]) == [0, 1, 1, 1, 1]
+
+def test_ruptures_scores_etales_tous_les_tiers():
+    indices = _tiers_ruptures_naturelles(list(range(100, 0, -2)))
+    assert indices == sorted(indices)
+    assert set(indices) == {0, 1, 2, 3, 4}
+
+def test_calculer_scores_et_tiers_ruptures_serrees():
+    stats = {
+        tag: {'developpement': dev, 'revenu': 10.0, 'FL': 50.0, 'qualite': 1.0}
+        for tag, dev in [('FRA', 1000.0), ('ENG', 999.0), ('CAS', 998.0)]
+    }
+    tiers = calculer_scores_et_tiers(stats, POIDS_DEFAUT, 'ruptures_naturelles')
+    assert list(tiers) == ['S']
+    assert [tag for tag, _ in tiers['S']] == ['FRA', 'ENG', 'CAS']
@@ -1,14 +1,21 @@
 # utils.py
+import sys
 import random
 import logging
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 class StreamlitHandler(logging.Handler):
     def emit(self, record):
         # Ne pas afficher les messages WARNING et ERROR concernant les drapeaux
-        if "Drapeau" in record.msg:
+        if "Drapeau" in str(record.msg):
             return
         msg = self.format(record)
+        if get_script_run_ctx() is None:
+            # Thread d'arrière-plan (préchargement, métriques) : pas de page où
+            # afficher le message, il part dans les logs du serveur
+            sys.stderr.write(msg + "\n")
+            return
         st.text(msg)
 
 def initialiser_logging():